@@ -1,17 +1,49 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # Startup checkpoints for --startup-profile are measured from here
+
 import sys
 import sqlite3
 import os
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
-                             QLabel, QLineEdit, QPushButton, QComboBox, QScrollArea, QFrame, QDialog,
-                             QMessageBox, QToolTip, QSizePolicy, QDateEdit, QTabWidget, QSpacerItem)
-from PyQt6.QtCore import Qt, QPropertyAnimation, QSize, QPoint, pyqtSignal, QDate
-from PyQt6.QtGui import QFont, QPainter, QBrush, QColor, QLinearGradient
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import uuid
-import numpy as np
+import re
+import csv
+import json
+import gzip
+import math
+import shutil
+import threading
+import argparse
+import queue
+import concurrent.futures
+import traceback
+import atexit
+import functools
+import weakref
+import importlib
+import hashlib
+import hmac
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
+STARTUP_MARKS = [("stdlib imported", time.perf_counter())]
+
+def startup_mark(label):
+    STARTUP_MARKS.append((label, time.perf_counter()))
+
+class LazyModule:
+    # Imports the module on first attribute access; looked-up attributes are cached on the proxy
+    def __init__(self, name):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._lazy_name), attr)
+        setattr(self, attr, value)
+        return value
+
+np = LazyModule("numpy")
+asyncio = LazyModule("asyncio")  # Only AsyncStore needs it
+HEAVY_MODULES = ["numpy", "matplotlib"]  # Reported by --startup-profile if loaded before first paint
+
 # Modern, sleek color palette
 PRIMARY_BG = "#1A1C2C"  # Deep navy
 SECONDARY_BG = "#25273A"  # Dark slate
@@ -34,152 +66,1731 @@ SUCCESS_HOVER = "#008F86"  # Darker teal
 CHART_COLORS = ["#FF2D55", "#00C4B4", "#FFB300", "#7E57C2", "#FF6F61", "#4CAF50"]  # Red, Teal, Amber, Purple, Coral, Green
 
 DB = "meal_plans.db"
+CHART_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB)), "chart_cache")  # None disables the disk tier
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+MEAL_TABS_LIMIT = 50  # Plans with more meals open in the table view
+PLAN_PAGE_SIZE = 100
+MEAL_PAGE_SIZE = 500
+FETCH_BATCH_SIZE = 1000  # Rows per fetchmany() in the streaming readers
+
+# Applied once when a connection is opened, not on every query
+SQLITE_PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),  # Negative means KiB, so ~16 MB of page cache
+    ("mmap_size", 268435456),  # 256 MB memory-mapped reads
+    ("busy_timeout", 5000),  # Wait up to 5s for a lock instead of failing
+    ("foreign_keys", "ON")
+]
+
+def close_connections(connections):
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass  # Owned by another thread; closed when its last reference goes
+    connections.clear()
+
+class ThreadConnections:
+    # One thread's connections; only its thread-local holds it, so they close when the thread ends
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.conn = None
+        self.read_conn = None
+        self.opened = []
+        self.finalizer = weakref.finalize(self, close_connections, self.opened)
+
+class ConnectionManager:
+    # One long-lived connection per thread, plus a read-only one for analytics
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = weakref.WeakSet()
+
+    def _connections(self):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = ThreadConnections()
+            with self._lock:
+                self._threads.add(connections)
+        return connections
+
+    def _open(self, read_only=False):
+        conn = sqlite3.connect(self.path)
+        for name, value in SQLITE_PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        self._connections().opened.append(conn)
+        return conn
+
+    def connection(self):
+        connections = self._connections()
+        if connections.conn is None:
+            connections.conn = self._open()
+        return connections.conn
+
+    def read_connection(self):
+        connections = self._connections()
+        if connections.read_conn is None:
+            connections.read_conn = self._open(read_only=True)
+        return connections.read_conn
+
+    def interrupt(self, thread_id):
+        # sqlite3 allows interrupt() from any thread; it aborts whatever that thread is running
+        with self._lock:
+            threads = [connections for connections in self._threads if connections.thread_id == thread_id]
+        for connections in threads:
+            for conn in list(connections.opened):
+                conn.interrupt()
+
+    def release(self):
+        # Closes the calling thread's connections now rather than when the thread ends
+        connections = getattr(self._local, "connections", None)
+        if connections is not None:
+            del self._local.connections
+            connections.finalizer()
+
+    def close_all(self):
+        with self._lock:
+            threads = list(self._threads)
+        for connections in threads:
+            connections.finalizer()
+        self._local = threading.local()
+
+db_manager = ConnectionManager(DB)
+atexit.register(db_manager.close_all)
+
+# Write-behind queue: one writer thread; commands arriving together share a commit, each in a savepoint
+WRITE_COALESCE_SECONDS = 0.01
+WRITE_BATCH_LIMIT = 1000
+
+def flush_command(conn):
+    return None, ()
+
+class WriteQueue:
+    def __init__(self, manager):
+        self.manager = manager
+        self.commands = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def submit(self, command, *args):
+        future = concurrent.futures.Future()
+        if self.thread is not None and threading.get_ident() == self.thread.ident:
+            self.run_batch([(future, command, args)])  # A listener writing from the writer thread
+            return future
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The write queue has been closed")
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="sqlite-writer", daemon=True)
+                self.thread.start()
+            self.commands.put((future, command, args))
+        return future
+
+    def call(self, command, *args, wait=True):
+        # wait=False returns the Future instead of blocking until the commit
+        future = self.submit(command, *args)
+        return future.result() if wait else future
+
+    def flush(self, timeout=None):
+        # Returns once everything submitted so far is committed
+        if self.thread is not None and not self.closed:
+            self.submit(flush_command).result(timeout)
+
+    def close(self, timeout=None):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.thread is None:
+                return
+            self.commands.put(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        running = True
+        while running:
+            item = self.commands.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + WRITE_COALESCE_SECONDS
+            while len(batch) < WRITE_BATCH_LIMIT:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.commands.get(timeout=remaining) if remaining > 0 else self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            self.run_batch(batch)
+        self.manager.release()
+
+    def run_batch(self, batch):
+        conn = None
+        outcomes = []
+        try:
+            conn = self.manager.connection()  # Opening can fail too; the batch's futures get the error
+            conn.execute("BEGIN IMMEDIATE")
+            for future, command, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT command")
+                try:
+                    result, changes = command(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO command")
+                    outcomes.append((future, e, None, ()))
+                else:
+                    outcomes.append((future, None, result, changes))
+                conn.execute("RELEASE command")
+            conn.commit()
+        except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for future, command, args in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, error, result, changes in outcomes:
+            for change in changes:
+                try:
+                    notify_change(*change)
+                except Exception:
+                    traceback.print_exc()  # A broken listener must not stall the writer
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+write_queue = WriteQueue(db_manager)
+atexit.register(write_queue.close)  # Registered after close_all, so it runs first
 
 def get_connection():
-    return sqlite3.connect(DB)
+    return db_manager.connection()
+
+def get_read_connection():
+    return db_manager.read_connection()
+
+def migrate_create_tables(cursor):
+    # IF NOT EXISTS so databases created before versioning upgrade in place
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )""")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meal_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            plan_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )""")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            plan_id INTEGER,
+            meal_name TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            calories REAL DEFAULT 0.0,
+            protein REAL DEFAULT 0.0,
+            carbs REAL DEFAULT 0.0,
+            fats REAL DEFAULT 0.0,
+            preparation_time INTEGER DEFAULT 0,
+            category TEXT DEFAULT 'Not Specified',
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (plan_id) REFERENCES meal_plans(id)
+        )""")
+
+def migrate_add_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meals_plan ON meals(plan_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meals_user_plan ON meals(user_id, plan_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meal_plans_user_date ON meal_plans(user_id, date)")
+    cursor.execute("ANALYZE")
+
+PLAN_TOTAL_COLUMNS = ["calories", "protein", "carbs", "fats", "preparation_time"]
+
+def migrate_add_plan_totals(cursor):
+    # One row per (user, plan, meal type), kept exact by triggers so stats never scan meals
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS plan_totals (
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            meal_type TEXT NOT NULL,
+            meal_count INTEGER NOT NULL DEFAULT 0,
+            calories REAL NOT NULL DEFAULT 0.0,
+            protein REAL NOT NULL DEFAULT 0.0,
+            carbs REAL NOT NULL DEFAULT 0.0,
+            fats REAL NOT NULL DEFAULT 0.0,
+            preparation_time INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, plan_id, meal_type)
+        ) WITHOUT ROWID""")
+
+    columns = ", ".join(PLAN_TOTAL_COLUMNS)
+    new_values = ", ".join(f"COALESCE(NEW.{c}, 0)" for c in PLAN_TOTAL_COLUMNS)
+    add_excluded = ", ".join(f"{c} = {c} + excluded.{c}" for c in PLAN_TOTAL_COLUMNS)
+    subtract_old = ", ".join(f"{c} = {c} - COALESCE(OLD.{c}, 0)" for c in PLAN_TOTAL_COLUMNS)
+    add_new = f"""
+        INSERT INTO plan_totals (user_id, plan_id, meal_type, meal_count, {columns})
+        SELECT NEW.user_id, NEW.plan_id, NEW.meal_type, 1, {new_values}
+        WHERE NEW.user_id IS NOT NULL AND NEW.plan_id IS NOT NULL
+        ON CONFLICT (user_id, plan_id, meal_type) DO UPDATE SET
+            meal_count = meal_count + 1, {add_excluded};"""
+    remove_old = f"""
+        UPDATE plan_totals SET meal_count = meal_count - 1, {subtract_old}
+        WHERE user_id = OLD.user_id AND plan_id = OLD.plan_id AND meal_type = OLD.meal_type;
+        DELETE FROM plan_totals
+        WHERE user_id = OLD.user_id AND plan_id = OLD.plan_id AND meal_type = OLD.meal_type
+              AND meal_count <= 0;"""
+
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS meals_totals_insert AFTER INSERT ON meals BEGIN {add_new} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS meals_totals_delete AFTER DELETE ON meals BEGIN {remove_old} END")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS meals_totals_update
+        AFTER UPDATE OF user_id, plan_id, meal_type, {columns} ON meals
+        BEGIN {remove_old} {add_new} END""")
+
+    # Backfill from whatever meals already exist
+    cursor.execute("DELETE FROM plan_totals")
+    cursor.execute(f"""
+        INSERT INTO plan_totals (user_id, plan_id, meal_type, meal_count, {columns})
+        SELECT user_id, plan_id, meal_type, COUNT(*), {", ".join(f"COALESCE(SUM({c}), 0)" for c in PLAN_TOTAL_COLUMNS)}
+        FROM meals
+        WHERE user_id IS NOT NULL AND plan_id IS NOT NULL
+        GROUP BY user_id, plan_id, meal_type""")
+
+def migrate_add_category_index(cursor):
+    # Covers the category count and protein-by-category analytics queries without touching the table
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meals_user_category ON meals(user_id, category, meal_type, protein)")
+    cursor.execute("ANALYZE")
+
+def migrate_add_data_revisions(cursor):
+    # Per-user counter bumped by every write, so derived data like charts can tell if it is current
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_revisions (
+            user_id INTEGER PRIMARY KEY,
+            revision INTEGER NOT NULL DEFAULT 0
+        )""")
+    for table in ("meals", "meal_plans"):
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_revision_{event.lower()} AFTER {event} ON {table}
+                WHEN {row}.user_id IS NOT NULL
+                BEGIN
+                    INSERT INTO data_revisions (user_id, revision) VALUES ({row}.user_id, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1;
+                END""")
+
+def migrate_add_password_versions(cursor):
+    # How users.password is encoded; 0 (plaintext) until the owner next logs in
+    cursor.execute("ALTER TABLE users ADD COLUMN password_version INTEGER NOT NULL DEFAULT 0")
+
+def migrate_add_database_id(cursor):
+    # Random id for this database file, so derived files can't outlive a replaced database
+    cursor.execute("CREATE TABLE IF NOT EXISTS database_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO database_info (key, value) VALUES ('id', ?)", (os.urandom(8).hex(),))
+
+# Append new migrations to the end; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    migrate_create_tables,
+    migrate_add_indexes,
+    migrate_add_plan_totals,
+    migrate_add_category_index,
+    migrate_add_data_revisions,
+    migrate_add_password_versions,
+    migrate_add_database_id
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def get_database_id():
+    with get_read_connection() as conn:
+        return conn.execute("SELECT value FROM database_info WHERE key='id'").fetchone()[0]
 
 def init_database():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL
-            )""")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS meal_plans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                plan_name TEXT NOT NULL,
-                date TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )""")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS meals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                plan_id INTEGER,
-                meal_name TEXT NOT NULL,
-                meal_type TEXT NOT NULL,
-                calories REAL DEFAULT 0.0,
-                protein REAL DEFAULT 0.0,
-                carbs REAL DEFAULT 0.0,
-                fats REAL DEFAULT 0.0,
-                preparation_time INTEGER DEFAULT 0,
-                category TEXT DEFAULT 'Not Specified',
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (plan_id) REFERENCES meal_plans(id)
-            )""")
+    conn = get_connection()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return  # Schema is current, skip all DDL
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock in case another process migrated first
+        version = get_schema_version(conn)
+        for version, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+            migrate(cursor)
+            cursor.execute(f"PRAGMA user_version={version}")
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 init_database()
-
-def login_user(username, password):
-    with get_connection() as conn:
-        return conn.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password)).fetchone()
-
-def register_user(username, password):
+startup_mark("database ready")
+
+# Credentials: salted KDF hashes, slow by design, so keep them off the GUI and writer threads
+PASSWORD_PLAIN = 0
+PASSWORD_SCRYPT = 1
+PASSWORD_PBKDF2 = 2
+PASSWORD_VERSION = PASSWORD_SCRYPT if hasattr(hashlib, "scrypt") else PASSWORD_PBKDF2
+PASSWORD_TARGET_MS = 250
+PASSWORD_SALT_BYTES = 16
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MIN_N = 2 ** 14
+SCRYPT_MAX_N = 2 ** 17  # 128 MiB of memory per hash with r=8
+PBKDF2_MIN_ITERATIONS = 200_000
+PBKDF2_MAX_ITERATIONS = 5_000_000
+
+kdf_cost = None
+kdf_lock = threading.Lock()
+
+def derive_key(version, password, salt, cost):
+    if version == PASSWORD_SCRYPT:
+        return hashlib.scrypt(password.encode(), salt=salt, n=cost, r=SCRYPT_R, p=SCRYPT_P,
+                              maxmem=256 * cost * SCRYPT_R)
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cost)
+
+def calibrate_kdf_cost(target_ms=PASSWORD_TARGET_MS):
+    # Times the minimum cost on this machine and scales it up to the target latency
+    low, high = (SCRYPT_MIN_N, SCRYPT_MAX_N) if PASSWORD_VERSION == PASSWORD_SCRYPT else \
+                (PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS)
+    started = time.perf_counter()
+    derive_key(PASSWORD_VERSION, "calibration", os.urandom(PASSWORD_SALT_BYTES), low)
+    scale = target_ms / max((time.perf_counter() - started) * 1000, 1)
+    if PASSWORD_VERSION == PASSWORD_SCRYPT:
+        cost = low * 2 ** max(0, int(math.log2(scale)))  # n has to be a power of two
+    else:
+        cost = int(low * max(1, scale))
+    return min(cost, high)
+
+def get_kdf_cost():
+    global kdf_cost
+    with kdf_lock:
+        if kdf_cost is None:
+            kdf_cost = calibrate_kdf_cost()
+        return kdf_cost
+
+def hash_password(password):
+    cost = get_kdf_cost()
+    salt = os.urandom(PASSWORD_SALT_BYTES)
+    key = derive_key(PASSWORD_VERSION, password, salt, cost)
+    return f"{cost}${salt.hex()}${key.hex()}", PASSWORD_VERSION
+
+def verify_password(password, stored, version):
+    if version == PASSWORD_PLAIN:
+        return hmac.compare_digest(password.encode(), stored.encode())
     try:
-        with get_connection() as conn:
-            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-            conn.commit()
-        return True
-    except sqlite3.IntegrityError:
+        cost, salt, key = stored.split("$")
+        derived = derive_key(version, password, bytes.fromhex(salt), int(cost))
+    except (ValueError, AttributeError):  # AttributeError: a scrypt hash on a Python without hashlib.scrypt
         return False
+    return hmac.compare_digest(derived, bytes.fromhex(key))
 
-def create_meal_plan(user_id, plan_name, date):
-    with get_connection() as conn:
-        conn.execute("INSERT INTO meal_plans (user_id, plan_name, date) VALUES (?, ?, ?)", 
-                    (user_id, plan_name, date))
-        conn.commit()
-
-def delete_meal_plan(plan_id):
-    with get_connection() as conn:
-        conn.execute("DELETE FROM meals WHERE plan_id=?", (plan_id,))
-        conn.execute("DELETE FROM meal_plans WHERE id=?", (plan_id,))
-        conn.commit()
+def password_needs_upgrade(stored, version):
+    if version != PASSWORD_VERSION:
+        return True
+    minimum = SCRYPT_MIN_N if version == PASSWORD_SCRYPT else PBKDF2_MIN_ITERATIONS
+    return int(stored.split("$", 1)[0]) < minimum
 
-def delete_all_plans(user_id):
+def login_user(username, password):
     with get_connection() as conn:
-        conn.execute("DELETE FROM meals WHERE user_id=?", (user_id,))
-        conn.execute("DELETE FROM meal_plans WHERE user_id=?", (user_id,))
-        conn.commit()
+        row = conn.execute("SELECT id, username, password, password_version FROM users WHERE username=?",
+                           (username,)).fetchone()
+    if row is None:
+        hash_password(password)  # Spend the same time, so unknown usernames can't be told apart
+        return None
+    user_id, name, stored, version = row
+    if not verify_password(password, stored, version):
+        return None
+    if password_needs_upgrade(stored, version):
+        # Plaintext and outdated hashes are replaced now that the password is known
+        write_queue.call(upgrade_password_command, user_id, stored, *hash_password(password), wait=False)
+    return user_id, name
+
+def upgrade_password_command(conn, user_id, old_password, password, version):
+    # Only if the password hasn't been changed in the meantime
+    conn.execute("UPDATE users SET password=?, password_version=? WHERE id=? AND password=?",
+                 (password, version, user_id, old_password))
+    return None, ()
+
+def register_user_command(conn, username, password, version):
+    try:
+        conn.execute("INSERT INTO users (username, password, password_version) VALUES (?, ?, ?)",
+                     (username, password, version))
+    except sqlite3.IntegrityError:
+        return False, ()
+    return True, ()
+
+def register_user(username, password, wait=True):
+    # Hashed on the calling thread so the writer thread is never held up by the KDF
+    return write_queue.call(register_user_command, username, *hash_password(password), wait=wait)
+
+def update_password_command(conn, user_id, password, version):
+    conn.execute("UPDATE users SET password=?, password_version=? WHERE id=?", (password, version, user_id))
+    return None, ()
+
+def update_password(user_id, password, wait=True):
+    return write_queue.call(update_password_command, user_id, *hash_password(password), wait=wait)
+
+def change_password(username, current_password, new_password):
+    user = login_user(username, current_password)
+    if user:
+        update_password(user[0], new_password)
+    return user is not None
+
+# Change notification: listener(event, user_id, plan_id, meal_id, revision) on the writer thread after commit
+MEAL_SAVED = "meal_saved"
+MEAL_UPDATED = "meal_updated"
+MEAL_DELETED = "meal_deleted"
+PLAN_CREATED = "plan_created"
+PLAN_DELETED = "plan_deleted"
+PLANS_CLEARED = "plans_cleared"
+MEALS_IMPORTED = "meals_imported"
+PLANS_GENERATED = "plans_generated"
+USERNAME_CHANGED = "username_changed"
+
+change_listeners = []
+
+def add_change_listener(listener):
+    change_listeners.append(listener)
+
+def remove_change_listener(listener):
+    change_listeners.remove(listener)
+
+def notify_change(event, user_id, plan_id=None, meal_id=None):
+    if not change_listeners or user_id is None:
+        return
+    revision = get_data_revision(user_id)
+    for listener in list(change_listeners):
+        listener(event, user_id, plan_id, meal_id, revision)
+
+# Write functions wait for their commit; wait=False returns the Future instead
+
+def create_meal_plan_command(conn, user_id, plan_name, date):
+    plan_id = conn.execute("INSERT INTO meal_plans (user_id, plan_name, date) VALUES (?, ?, ?)", 
+                           (user_id, plan_name, date)).lastrowid
+    return plan_id, [(PLAN_CREATED, user_id, plan_id)]
+
+def create_meal_plan(user_id, plan_name, date, wait=True):
+    return write_queue.call(create_meal_plan_command, user_id, plan_name, date, wait=wait)
+
+def delete_meal_plan_command(conn, plan_id):
+    owner = conn.execute("SELECT user_id FROM meal_plans WHERE id=?", (plan_id,)).fetchone()
+    conn.execute("DELETE FROM meals WHERE plan_id=?", (plan_id,))
+    conn.execute("DELETE FROM meal_plans WHERE id=?", (plan_id,))
+    return None, [(PLAN_DELETED, owner[0], plan_id)] if owner else ()
+
+def delete_meal_plan(plan_id, wait=True):
+    return write_queue.call(delete_meal_plan_command, plan_id, wait=wait)
+
+def copy_plans(conn, user_id, copies):
+    # copies: [(source_plan_id, plan_name, date)]; all their meals are copied in one INSERT ... SELECT
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS plan_copies (source_id INTEGER, target_id INTEGER)")
+    conn.execute("DELETE FROM plan_copies")
+    mapping = []
+    for source_id, plan_name, date in copies:
+        target_id = conn.execute("INSERT INTO meal_plans (user_id, plan_name, date) VALUES (?, ?, ?)",
+                                 (user_id, plan_name, date)).lastrowid
+        mapping.append((source_id, target_id))
+    conn.executemany("INSERT INTO plan_copies (source_id, target_id) VALUES (?, ?)", mapping)
+    conn.execute("""
+        INSERT INTO meals (user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats,
+                           preparation_time, category)
+        SELECT ?, c.target_id, m.meal_name, m.meal_type, m.calories, m.protein, m.carbs, m.fats,
+               m.preparation_time, m.category
+        FROM plan_copies c
+        JOIN meals m ON m.plan_id = c.source_id
+        ORDER BY c.target_id, m.id
+    """, (user_id,))
+    conn.execute("DELETE FROM plan_copies")
+    return [target_id for _, target_id in mapping]
+
+def clone_plan_command(conn, plan_id, new_name, new_date):
+    owner = conn.execute("SELECT user_id FROM meal_plans WHERE id=?", (plan_id,)).fetchone()
+    if not owner:
+        return None, ()
+    new_plan_id = copy_plans(conn, owner[0], [(plan_id, new_name, new_date)])[0]
+    return new_plan_id, [(PLAN_CREATED, owner[0], new_plan_id)]
+
+def clone_plan(plan_id, new_name, new_date, wait=True):
+    return write_queue.call(clone_plan_command, plan_id, new_name, new_date, wait=wait)
+
+def instantiate_template_command(conn, user_id, template_from, template_to, start_date, end_date):
+    template_start = datetime.strptime(template_from, "%Y-%m-%d").date()
+    period = (datetime.strptime(template_to, "%Y-%m-%d").date() - template_start).days + 1
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    template = conn.execute("""
+        SELECT id, plan_name, date FROM meal_plans
+        WHERE user_id=? AND date >= ? AND date <= ?
+        ORDER BY date, id
+    """, (user_id, template_from, template_to)).fetchall()
+    copies = []
+    for repeat in range((end - start).days // period + 1):
+        for source_id, plan_name, date in template:
+            offset = (datetime.strptime(date, "%Y-%m-%d").date() - template_start).days
+            new_date = start + timedelta(days=repeat * period + offset)
+            if new_date <= end:
+                copies.append((source_id, plan_name, new_date.isoformat()))
+    if not copies:
+        return [], ()
+    return copy_plans(conn, user_id, copies), [(PLANS_GENERATED, user_id)]
+
+def instantiate_template(user_id, template_from, template_to, start_date, end_date, wait=True):
+    # Repeats the plans dated template_from..template_to from start_date to end_date; returns the new ids
+    dates = []
+    for date in (template_from, template_to, start_date, end_date):
+        try:
+            dates.append(datetime.strptime(date, "%Y-%m-%d").date())
+        except ValueError:
+            raise ValueError(f"Invalid date {date!r}; expected YYYY-MM-DD.")
+    template_from, template_to, start_date, end_date = dates
+    if template_to < template_from or end_date < start_date:
+        raise ValueError("Date ranges must not end before they start.")
+    return write_queue.call(instantiate_template_command, user_id, template_from.isoformat(), template_to.isoformat(),
+                            start_date.isoformat(), end_date.isoformat(), wait=wait)
+
+def delete_all_plans_command(conn, user_id):
+    conn.execute("DELETE FROM meals WHERE user_id=?", (user_id,))
+    conn.execute("DELETE FROM meal_plans WHERE user_id=?", (user_id,))
+    return None, [(PLANS_CLEARED, user_id)]
+
+def delete_all_plans(user_id, wait=True):
+    return write_queue.call(delete_all_plans_command, user_id, wait=wait)
+
+def iter_batches(cursor, size=FETCH_BATCH_SIZE):
+    try:
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
 
 def get_plans_for_user(user_id):
     with get_connection() as conn:
         return conn.execute("SELECT id, plan_name, date FROM meal_plans WHERE user_id=?", 
                           (user_id,)).fetchall()
 
-def save_meal(user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats, 
-              preparation_time, category):
+# "2025", "2025-03" or "2025-01..2025-03" filter by date; anything else matches plan names
+PLAN_DATE_SEARCH = re.compile(r"^(\d{4}(?:-\d{2}){0,2})(?:\s*(?:\.\.|to)\s*(\d{4}(?:-\d{2}){0,2}))?$")
+
+def plan_search_range(search):
+    match = PLAN_DATE_SEARCH.match(search.strip())
+    if match:
+        return match.group(1), (match.group(2) or match.group(1)) + "~"  # "~" sorts after any date suffix
+    return None
+
+def plan_matches_search(plan, search):
+    search = search.strip()
+    date_range = plan_search_range(search)
+    if date_range:
+        return date_range[0] <= plan[2] <= date_range[1]
+    return search.lower() in plan[1].lower()
+
+def get_plans_page(user_id, after_date=None, after_id=None, limit=PLAN_PAGE_SIZE, search=""):
+    # Keyset pagination, newest first: each page is one range scan of idx_meal_plans_user_date
+    query = "SELECT id, plan_name, date FROM meal_plans WHERE user_id=?"
+    params = [user_id]
+    date_range = plan_search_range(search)
+    if date_range:
+        query += " AND date >= ? AND date <= ?"
+        params += date_range
+    elif search.strip():
+        pattern = re.sub(r"([\\%_])", r"\\\1", search.strip())
+        query += " AND plan_name LIKE ? ESCAPE '\\'"
+        params.append(f"%{pattern}%")
+    if after_id is not None:
+        query += " AND (date, id) < (?, ?)"
+        params += [after_date, after_id]
+    query += " ORDER BY date DESC, id DESC LIMIT ?"
+    params.append(limit)
+    with get_read_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+def get_plan(plan_id):
     with get_connection() as conn:
-        conn.execute("""
-            INSERT INTO meals (user_id, plan_id, meal_name, meal_type, calories, protein, 
-                             carbs, fats, preparation_time, category)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats, 
-              preparation_time, category))
-        conn.commit()
+        return conn.execute("SELECT id, plan_name, date FROM meal_plans WHERE id=?", (plan_id,)).fetchone()
+
+def save_meal_command(conn, user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats, 
+                      preparation_time, category):
+    meal_id = conn.execute("""
+        INSERT INTO meals (user_id, plan_id, meal_name, meal_type, calories, protein, 
+                         carbs, fats, preparation_time, category)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats, 
+          preparation_time, category)).lastrowid
+    return meal_id, [(MEAL_SAVED, user_id, plan_id, meal_id)]
+
+def save_meal(user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats, 
+              preparation_time, category, wait=True):
+    return write_queue.call(save_meal_command, user_id, plan_id, meal_name, meal_type, calories, protein,
+                            carbs, fats, preparation_time, category, wait=wait)
+
+def update_meal_command(conn, meal_id, meal_name, meal_type, calories, protein, carbs, fats, 
+                        preparation_time, category):
+    conn.execute("""
+        UPDATE meals SET meal_name=?, meal_type=?, calories=?, protein=?, carbs=?, 
+                       fats=?, preparation_time=?, category=?
+        WHERE id=?
+    """, (meal_name, meal_type, calories, protein, carbs, fats, preparation_time, 
+          category, meal_id))
+    owner = conn.execute("SELECT user_id, plan_id FROM meals WHERE id=?", (meal_id,)).fetchone()
+    return None, [(MEAL_UPDATED, owner[0], owner[1], meal_id)] if owner else ()
 
 def update_meal(meal_id, meal_name, meal_type, calories, protein, carbs, fats, 
-                preparation_time, category):
-    with get_connection() as conn:
-        conn.execute("""
-            UPDATE meals SET meal_name=?, meal_type=?, calories=?, protein=?, carbs=?, 
-                           fats=?, preparation_time=?, category=?
-            WHERE id=?
-        """, (meal_name, meal_type, calories, protein, carbs, fats, preparation_time, 
-              category, meal_id))
-        conn.commit()
+                preparation_time, category, wait=True):
+    return write_queue.call(update_meal_command, meal_id, meal_name, meal_type, calories, protein, carbs,
+                            fats, preparation_time, category, wait=wait)
 
-def update_username(user_id, new_username):
+def update_username_command(conn, user_id, new_username):
     try:
-        with get_connection() as conn:
-            conn.execute("UPDATE users SET username=? WHERE id=?", (new_username, user_id))
-            conn.commit()
-        return True
+        conn.execute("UPDATE users SET username=? WHERE id=?", (new_username, user_id))
     except sqlite3.IntegrityError:
-        return False
+        return False, ()
+    return True, [(USERNAME_CHANGED, user_id)]
+
+def update_username(user_id, new_username, wait=True):
+    return write_queue.call(update_username_command, user_id, new_username, wait=wait)
+
+MEAL_ROW_SQL = """
+    SELECT id, meal_name, meal_type, calories, protein, carbs, fats, 
+           preparation_time, category
+    FROM meals
+"""
 
 def get_meals_in_plan(plan_id):
     with get_connection() as conn:
-        return conn.execute("""
-            SELECT id, meal_name, meal_type, calories, protein, carbs, fats, 
-                   preparation_time, category
-            FROM meals WHERE plan_id=?
-        """, (plan_id,)).fetchall()
+        return conn.execute(MEAL_ROW_SQL + " WHERE plan_id=? ORDER BY id", (plan_id,)).fetchall()
+
+def get_meals_page(plan_id, after_id=None, limit=MEAL_PAGE_SIZE):
+    # idx_meals_plan ends in the rowid, so "id > ?" continues the index scan where the last page stopped
+    with get_read_connection() as conn:
+        return conn.execute(MEAL_ROW_SQL + " WHERE plan_id=? AND id > ? ORDER BY id LIMIT ?",
+                            (plan_id, -1 if after_id is None else after_id, limit)).fetchall()
+
+def get_meal(meal_id):
+    with get_connection() as conn:
+        return conn.execute(MEAL_ROW_SQL + " WHERE id=?", (meal_id,)).fetchone()
 
 def get_account_info(user_id):
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM meal_plans WHERE user_id=?", (user_id,))
         plan_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM meals WHERE user_id=?", (user_id,))
+        cursor.execute("SELECT COALESCE(SUM(meal_count), 0) FROM plan_totals WHERE user_id=?", (user_id,))
         meal_count = cursor.fetchone()[0]
         return plan_count, meal_count
 
-def delete_meal(meal_id):
-    with get_connection() as conn:
-        conn.execute("DELETE FROM meals WHERE id=?", (meal_id,))
-        conn.commit()
+def delete_meal_command(conn, meal_id):
+    owner = conn.execute("SELECT user_id, plan_id FROM meals WHERE id=?", (meal_id,)).fetchone()
+    conn.execute("DELETE FROM meals WHERE id=?", (meal_id,))
+    return None, [(MEAL_DELETED, owner[0], owner[1], meal_id)] if owner else ()
+
+def delete_meal(meal_id, wait=True):
+    return write_queue.call(delete_meal_command, meal_id, wait=wait)
+
+def read_data_revision(conn, user_id):
+    row = conn.execute("SELECT revision FROM data_revisions WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def get_data_revision(user_id):
+    with get_read_connection() as conn:
+        return read_data_revision(conn, user_id)
 
 def get_plan_statistics(user_id):
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT mp.id, mp.plan_name, mp.date, COUNT(m.id) as meal_count,
-                   AVG(m.calories) as avg_calories,
-                   SUM(m.protein) as total_protein,
-                   SUM(m.carbs) as total_carbs,
-                   SUM(m.fats) as total_fats
+            SELECT mp.id, mp.plan_name, mp.date, COALESCE(SUM(pt.meal_count), 0) as meal_count,
+                   SUM(pt.calories) / SUM(pt.meal_count) as avg_calories,
+                   SUM(pt.protein) as total_protein,
+                   SUM(pt.carbs) as total_carbs,
+                   SUM(pt.fats) as total_fats
             FROM meal_plans mp
-            LEFT JOIN meals m ON mp.id = m.plan_id AND m.user_id = ?
+            LEFT JOIN plan_totals pt ON pt.user_id = ? AND pt.plan_id = mp.id
             WHERE mp.user_id = ?
             GROUP BY mp.id, mp.plan_name, mp.date
         """, (user_id, user_id))
         return cursor.fetchall()
 
+class TaskCancelled(Exception):
+    pass
+
+MEAL_TYPES = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+MACRO_NAMES = ['Protein', 'Carbs', 'Fats']
+MEAL_CATEGORIES = ["Not Specified", "Vegetarian", "Vegan", "Keto", "Gluten-Free", "Paleo", "Low-Carb",
+                   "High-Protein", "Dairy-Free", "Low-Fat", "Whole30", "Mediterranean", "Low-Sodium",
+                   "Pescatarian"]
+
+ANALYTICS_ROWS_SQL = """
+    SELECT m.meal_type, m.category, mp.date, COALESCE(m.calories, 0), COALESCE(m.protein, 0),
+           COALESCE(m.carbs, 0), COALESCE(m.fats, 0), COALESCE(m.preparation_time, 0)
+    FROM meals m
+    JOIN meal_plans mp ON mp.id = m.plan_id
+    WHERE m.user_id = ? AND mp.user_id = ?
+"""
+
+def iter_analytics_batches(conn, user_id, batch_size=FETCH_BATCH_SIZE):
+    # Streams on the caller's connection so the rows share its read snapshot
+    yield from iter_batches(conn.execute(ANALYTICS_ROWS_SQL, (user_id, user_id)), batch_size)
+
+class AnalyticsEngine:
+    # A user's meals as parallel NumPy columns; compute() yields every series in one pass
+    def __init__(self, meal_types, categories, dates, calories, protein, carbs, fats, prep, counts=None):
+        self.calories = np.asarray(calories, dtype=float)
+        self.protein = np.asarray(protein, dtype=float)
+        self.carbs = np.asarray(carbs, dtype=float)
+        self.fats = np.asarray(fats, dtype=float)
+        self.prep = np.asarray(prep, dtype=float)
+        # A row may stand for several meals when the caller has already grouped them
+        self.counts = np.ones(len(self.calories)) if counts is None else np.asarray(counts, dtype=float)
+
+        # Encode the text columns once; everything after this works on integer codes
+        type_labels, type_codes = np.unique(np.asarray(meal_types, dtype=str), return_inverse=True)
+        known_types = np.array([MEAL_TYPES.index(t) if t in MEAL_TYPES else -1 for t in type_labels], dtype=int)
+        self.type_codes = known_types[type_codes]
+        self.category_labels, self.category_codes = np.unique(np.asarray(categories, dtype=str), return_inverse=True)
+        self.date_labels, self.date_codes = np.unique(np.asarray(dates, dtype=str), return_inverse=True)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows: (meal_type, category, date, calories, protein, carbs, fats, preparation_time)
+        if not rows:
+            return cls([], [], [], [], [], [], [], [])
+        return cls(*zip(*rows))
+
+    @classmethod
+    def from_batches(cls, batches):
+        # Each batch becomes column arrays as it arrives, so one batch of tuples is alive at a time
+        columns = [[] for _ in range(8)]
+        for batch in batches:
+            for column, values in zip(columns, zip(*batch)):
+                column.append(np.asarray(values))
+        if not columns[0]:
+            return cls([], [], [], [], [], [], [], [])
+        return cls(*(np.concatenate(column) for column in columns))
+
+    @classmethod
+    def load(cls, conn, user_id):
+        return cls.from_batches(iter_analytics_batches(conn, user_id))
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def compute(self):
+        n_types = len(MEAL_TYPES)
+        n_categories = len(self.category_labels)
+
+        known = self.type_codes >= 0
+        type_codes = self.type_codes[known]
+        type_counts = np.bincount(type_codes, weights=self.counts[known], minlength=n_types)
+
+        def per_type_average(values):
+            totals = np.bincount(type_codes, weights=values[known], minlength=n_types)
+            return np.divide(totals, type_counts, out=np.zeros(n_types), where=type_counts > 0)
+
+        daily_calories = np.bincount(self.date_codes, weights=self.calories, minlength=len(self.date_labels))
+
+        # Pie wedges keep the order categories first appear in, like the original dict did
+        category_counts = np.bincount(self.category_codes, weights=self.counts, minlength=n_categories)
+        first_seen = np.full(n_categories, len(self.category_codes))
+        np.minimum.at(first_seen, self.category_codes, np.arange(len(self.category_codes)))
+        pie_order = np.argsort(first_seen, kind="stable")
+
+        # Protein by (category, meal type) as one flat group-by reshaped into a grid
+        cell = self.category_codes[known] * n_types + type_codes
+        cell_protein = np.bincount(cell, weights=self.protein[known], minlength=n_categories * n_types)
+        cell_counts = np.bincount(cell, weights=self.counts[known], minlength=n_categories * n_types)
+        avg_protein = np.divide(cell_protein, cell_counts, out=np.zeros(n_categories * n_types), where=cell_counts > 0)
+
+        return {
+            'meal_count': len(self),
+            'macro_totals': dict(zip(MACRO_NAMES, (float(self.protein.sum()), float(self.carbs.sum()), float(self.fats.sum())))),
+            'meal_types': list(MEAL_TYPES),
+            'avg_calories': per_type_average(self.calories).tolist(),
+            'avg_prep': per_type_average(self.prep).tolist(),
+            'dates': self.date_labels.tolist(),
+            'daily_calories': daily_calories.tolist(),
+            'category_labels': self.category_labels[pie_order].tolist(),
+            'category_counts': category_counts[pie_order].astype(int).tolist(),
+            'protein_categories': self.category_labels.tolist(),
+            'avg_protein': avg_protein.reshape(n_categories, n_types)
+        }
+
+# Analytics aggregates: grouped queries over plan_totals or an index, all in one read transaction
+def get_macro_totals(conn, user_id):
+    return conn.execute("""
+        SELECT COALESCE(SUM(meal_count), 0), COALESCE(SUM(protein), 0),
+               COALESCE(SUM(carbs), 0), COALESCE(SUM(fats), 0)
+        FROM plan_totals WHERE user_id=?
+    """, (user_id,)).fetchone()
+
+def get_meal_type_averages(conn, user_id):
+    return conn.execute("""
+        SELECT meal_type, SUM(calories) / SUM(meal_count), SUM(preparation_time) * 1.0 / SUM(meal_count)
+        FROM plan_totals WHERE user_id=?
+        GROUP BY meal_type
+    """, (user_id,)).fetchall()
+
+def get_daily_calories(conn, user_id):
+    return conn.execute("""
+        SELECT mp.date, SUM(pt.calories)
+        FROM meal_plans mp
+        JOIN plan_totals pt ON pt.user_id = mp.user_id AND pt.plan_id = mp.id
+        WHERE mp.user_id=?
+        GROUP BY mp.date
+        ORDER BY mp.date
+    """, (user_id,)).fetchall()
+
+def get_category_counts(conn, user_id):
+    # Ordered by first use so pie wedges keep a stable order as meals are added
+    return conn.execute("""
+        SELECT category, COUNT(*) FROM meals WHERE user_id=?
+        GROUP BY category
+        ORDER BY MIN(id)
+    """, (user_id,)).fetchall()
+
+def get_protein_by_type_and_category(conn, user_id):
+    return conn.execute("""
+        SELECT category, meal_type, AVG(protein) FROM meals WHERE user_id=?
+        GROUP BY category, meal_type
+    """, (user_id,)).fetchall()
+
+def get_analytics_summary(user_id, progress=None):
+    # Every analytics series; progress(done, total) runs after each query and may raise to stop
+    total_steps = 5
+    report = progress or (lambda done, total: None)
+
+    conn = get_read_connection()
+    conn.execute("BEGIN")  # All queries and the revision see the same snapshot
+    try:
+        revision = read_data_revision(conn, user_id)
+        meal_count, protein, carbs, fats = get_macro_totals(conn, user_id)
+        report(1, total_steps)
+
+        type_averages = {mtype: (cal, prep) for mtype, cal, prep in get_meal_type_averages(conn, user_id)}
+        avg_calories = [type_averages.get(t, (0, 0))[0] or 0 for t in MEAL_TYPES]
+        avg_prep = [type_averages.get(t, (0, 0))[1] or 0 for t in MEAL_TYPES]
+        report(2, total_steps)
+
+        daily = get_daily_calories(conn, user_id)
+        report(3, total_steps)
+        categories = get_category_counts(conn, user_id)
+        report(4, total_steps)
+        protein_rows = get_protein_by_type_and_category(conn, user_id)
+    finally:
+        conn.rollback()
+
+    # The grid's rows come from the protein query itself
+    protein_categories = sorted({cat for cat, _, _ in protein_rows})
+    category_index = {cat: idx for idx, cat in enumerate(protein_categories)}
+    type_index = {mtype: idx for idx, mtype in enumerate(MEAL_TYPES)}
+    avg_protein = np.zeros((len(protein_categories), len(MEAL_TYPES)))
+    for cat, mtype, value in protein_rows:
+        if mtype in type_index:
+            avg_protein[category_index[cat], type_index[mtype]] = value or 0
+    report(5, total_steps)
+
+    return {
+        'revision': revision,
+        'meal_count': meal_count,
+        'macro_totals': dict(zip(MACRO_NAMES, (protein, carbs, fats))),
+        'meal_types': list(MEAL_TYPES),
+        'avg_calories': avg_calories,
+        'avg_prep': avg_prep,
+        'dates': [date for date, _ in daily],
+        'daily_calories': [total for _, total in daily],
+        'category_labels': [cat for cat, _ in categories],
+        'category_counts': [count for _, count in categories],
+        'protein_categories': protein_categories,
+        'avg_protein': avg_protein
+    }
+
+# Bulk import: CSV or JSON Lines, optionally gzipped, validated like the meal dialog
+IMPORT_BATCH_SIZE = 5000
+IMPORT_ERROR_LIMIT = 100  # Row errors kept for the report; the rest are only counted
+IMPORT_FIELDS = ["plan_name", "date", "meal_name", "meal_type", "calories", "protein", "carbs", "fats",
+                 "preparation_time", "category"]
+IMPORT_REQUIRED_FIELDS = {"plan_name", "date", "meal_name", "meal_type"}
+
+class MealValidationError(ValueError):
+    pass
+
+def validate_meal(meal_name, meal_type, calories, protein, carbs, fats, preparation_time, category):
+    # A validated meal tuple for save_meal/update_meal; blank numbers count as 0
+    try:
+        macros = [float(str(value).strip() or 0) if value is not None else 0.0
+                  for value in (calories, protein, carbs, fats)]
+        prep = int(str(preparation_time).strip() or 0) if preparation_time is not None else 0
+    except ValueError:
+        raise MealValidationError("Please enter valid numbers for nutritional values and prep time.")
+    if not all(math.isfinite(value) for value in macros):
+        raise MealValidationError("Please enter valid numbers for nutritional values and prep time.")
+    meal_name = (meal_name or "").strip()
+    if not meal_name:
+        raise MealValidationError("Please fill in the required field (Meal Name).")
+    if min(macros) < 0 or prep < 0:
+        raise MealValidationError("Nutritional values and prep time cannot be negative.")
+    if meal_type not in MEAL_TYPES:
+        raise MealValidationError(f"Unknown meal type: {meal_type!r}.")
+    category = category or "Not Specified"
+    if category not in MEAL_CATEGORIES:
+        raise MealValidationError(f"Unknown category: {category!r}.")
+    return (meal_name, meal_type, *macros, prep, category)
+
+PLAN_DATE_FORMAT = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def validate_plan(plan_name, date):
+    plan_name = (plan_name or "").strip()
+    if not plan_name:
+        raise MealValidationError("Missing plan name.")
+    text = str(date).strip()
+    try:
+        if not PLAN_DATE_FORMAT.match(text):
+            raise ValueError(text)
+        datetime.fromisoformat(text)  # Range check only; much cheaper than strptime per row
+    except ValueError:
+        raise MealValidationError(f"Invalid plan date {date!r}; expected YYYY-MM-DD.")
+    return plan_name, text
+
+def open_text(path, mode="rt", compress=None):
+    if path.endswith(".gz") if compress is None else compress:
+        return gzip.open(path, mode, encoding="utf-8-sig" if "r" in mode else "utf-8", newline="")
+    return open(path, mode, encoding="utf-8-sig" if "r" in mode else "utf-8", newline="")
+
+def iter_import_records(path):
+    # Yields (line number, record); an unparsable line yields a MealValidationError instead
+    extension = os.path.splitext(path[:-3] if path.endswith(".gz") else path)[1].lower()
+    if extension not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Unsupported import format: {os.path.basename(path)} (use .csv or .jsonl)")
+    with open_text(path) as f:
+        if extension == ".csv":
+            reader = csv.DictReader(f)
+            missing = IMPORT_REQUIRED_FIELDS - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, MealValidationError(f"Invalid JSON: {e.msg}.")
+                continue
+            if not isinstance(record, dict):
+                record = MealValidationError("Expected a JSON object.")
+            yield line_no, record
+
+def import_batch_command(conn, user_id, rows, plan_ids):
+    # plan_ids is only read here, since this batch may still roll back; the caller caches the ids returned
+    cached = {plan_ids[key] for key in {(plan_name, date) for plan_name, date, _ in rows} if key in plan_ids}
+    existing = {row[0] for row in conn.execute(
+        "SELECT id FROM meal_plans WHERE user_id=? AND id IN (SELECT value FROM json_each(?))",
+        (user_id, json.dumps(sorted(cached))))} if cached else set()
+    resolved = {}
+    plans_created = 0
+    values = []
+    for plan_name, date, meal in rows:
+        key = (plan_name, date)
+        if key not in resolved:
+            if plan_ids.get(key) in existing:
+                resolved[key] = plan_ids[key]
+            else:
+                row = conn.execute("SELECT id FROM meal_plans WHERE user_id=? AND date=? AND plan_name=? ORDER BY id LIMIT 1",
+                                   (user_id, date, plan_name)).fetchone()
+                if row:
+                    resolved[key] = row[0]
+                else:
+                    resolved[key] = conn.execute("INSERT INTO meal_plans (user_id, plan_name, date) VALUES (?, ?, ?)",
+                                                 (user_id, plan_name, date)).lastrowid
+                    plans_created += 1
+        values.append((user_id, resolved[key]) + meal)
+    conn.executemany("""
+        INSERT INTO meals (user_id, plan_id, meal_name, meal_type, calories, protein, 
+                         carbs, fats, preparation_time, category)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, values)
+    return (plans_created, resolved), ()
+
+def notify_command(conn, *change):
+    return None, [change]
+
+def import_meals(user_id, path, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    # One writer command per batch, so an error or cancel keeps the batches already committed
+    started = time.perf_counter()
+    plan_ids = {}
+    batch = []
+    errors = []
+    counts = {'rows': 0, 'imported': 0, 'plans_created': 0, 'errors': 0}
+
+    def flush():
+        if batch:
+            created, resolved = write_queue.call(import_batch_command, user_id, list(batch), plan_ids)
+            plan_ids.update(resolved)
+            counts['plans_created'] += created
+            counts['imported'] += len(batch)
+            batch.clear()
+        if progress:
+            progress(counts['rows'], 0)
+
+    try:
+        for line_no, record in iter_import_records(path):
+            counts['rows'] += 1
+            try:
+                if isinstance(record, MealValidationError):
+                    raise record
+                plan_name, date = validate_plan(record.get("plan_name"), record.get("date"))
+                meal = validate_meal(*(record.get(field) for field in IMPORT_FIELDS[2:]))
+            except MealValidationError as e:
+                counts['errors'] += 1
+                if len(errors) < IMPORT_ERROR_LIMIT:
+                    errors.append((line_no, str(e)))
+                continue
+            batch.append((plan_name, date, meal))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    finally:
+        if counts['imported'] or counts['plans_created']:
+            write_queue.call(notify_command, MEALS_IMPORTED, user_id)
+
+    seconds = time.perf_counter() - started
+    return {
+        'rows': counts['rows'],
+        'imported': counts['imported'],
+        'plans_created': counts['plans_created'],
+        'error_count': counts['errors'],
+        'errors': errors,
+        'seconds': seconds,
+        'rows_per_second': counts['rows'] / seconds if seconds > 0 else 0.0
+    }
+
+# Export: the import column layout, streamed from one read snapshot
+EXPORT_FORMATS = (".csv", ".jsonl", ".npz")
+
+EXPORT_FROM_SQL = """
+    FROM meal_plans mp
+    JOIN meals m ON m.plan_id = mp.id
+    WHERE mp.user_id = ? AND m.user_id = ? AND mp.date >= ? AND mp.date <= ?
+"""
+
+def export_range_params(user_id, date_from, date_to):
+    return (user_id, user_id, date_from or "", (date_to or "9999-12-31") + "~")
+
+def iter_export_batches(user_id, date_from=None, date_to=None, batch_size=FETCH_BATCH_SIZE):
+    # Rows: IMPORT_FIELDS, ordered by plan date, plan and meal; walks the user/date index with no sort
+    cursor = get_read_connection().execute("""
+        SELECT mp.plan_name, mp.date, m.meal_name, m.meal_type, COALESCE(m.calories, 0), COALESCE(m.protein, 0),
+               COALESCE(m.carbs, 0), COALESCE(m.fats, 0), COALESCE(m.preparation_time, 0),
+               COALESCE(m.category, 'Not Specified')
+    """ + EXPORT_FROM_SQL + " ORDER BY mp.date, mp.id, m.id", export_range_params(user_id, date_from, date_to))
+    yield from iter_batches(cursor, batch_size)
+
+def write_csv_export(f, batches, report):
+    writer = csv.writer(f)
+    writer.writerow(IMPORT_FIELDS)
+    for batch in batches:
+        writer.writerows(batch)
+        report(len(batch))
+
+def write_jsonl_export(f, batches, report):
+    for batch in batches:
+        f.writelines(json.dumps(dict(zip(IMPORT_FIELDS, row))) + "\n" for row in batch)
+        report(len(batch))
+
+def write_npz_export(path, batches, report, total, text_widths, compress):
+    import tempfile
+    import zipfile
+    # One .npy member per column, spooled to temp files and copied in behind a known-length header
+    dtypes = [np.dtype(f"<U{max(width, 1)}") for width in text_widths[:4]] + [np.dtype("<f8")] * 4 + \
+             [np.dtype("<i8"), np.dtype(f"<U{max(text_widths[4], 1)}")]
+    spools = [tempfile.TemporaryFile() for _ in IMPORT_FIELDS]
+    try:
+        for batch in batches:
+            for spool, dtype, values in zip(spools, dtypes, zip(*batch)):
+                np.asarray(values, dtype=dtype).tofile(spool)
+            report(len(batch))
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(path, "w", compression=compression, allowZip64=True) as archive:
+            for name, spool, dtype in zip(IMPORT_FIELDS, spools, dtypes):
+                spool.seek(0)
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (total,)
+                    })
+                    shutil.copyfileobj(spool, member)
+    finally:
+        for spool in spools:
+            spool.close()
+
+def export_meals(user_id, path, date_from=None, date_to=None, compress=None, progress=None):
+    # Format from the extension (.csv, .jsonl, .npz; .gz gzips text); dates are inclusive
+    started = time.perf_counter()
+    compressed_name = path.endswith(".gz")
+    extension = os.path.splitext(path[:-3] if compressed_name else path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {os.path.basename(path)} (use .csv, .jsonl or .npz)")
+    compress = compressed_name if compress is None else compress
+    written = [0]
+
+    conn = get_read_connection()
+    conn.execute("BEGIN")  # The count and the row stream see the same snapshot
+    try:
+        stats = conn.execute("""
+            SELECT COUNT(*), MAX(LENGTH(mp.plan_name)), MAX(LENGTH(mp.date)), MAX(LENGTH(m.meal_name)),
+                   MAX(LENGTH(m.meal_type)), MAX(LENGTH(COALESCE(m.category, 'Not Specified')))
+        """ + EXPORT_FROM_SQL, export_range_params(user_id, date_from, date_to)).fetchone()
+        total = stats[0]
+
+        def report(count):
+            written[0] += count
+            if progress:
+                progress(written[0], total)
+
+        batches = iter_export_batches(user_id, date_from, date_to)
+        if extension == ".npz":
+            write_npz_export(path, batches, report, total, [width or 0 for width in stats[1:]], compress)
+        else:
+            with open_text(path, "wt", compress) as f:
+                (write_csv_export if extension == ".csv" else write_jsonl_export)(f, batches, report)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)  # Don't leave a truncated export behind
+        raise
+    finally:
+        conn.rollback()
+
+    return {
+        'rows': written[0],
+        'bytes': os.path.getsize(path),
+        'seconds': time.perf_counter() - started
+    }
+
+# asyncio facade: reads on a bounded pool, writes through the write queue, in-flight calls capped
+ASYNC_MAX_WORKERS = 4
+ASYNC_MAX_CONCURRENCY = 64
+
+class AsyncCall:
+    def __init__(self, manager, fn, args, kwargs):
+        self.manager = manager
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.is_cancelled = False
+        self.thread_id = None
+
+    def cancel(self):
+        with self.lock:
+            self.is_cancelled = True
+            if self.thread_id is not None:
+                self.manager.interrupt(self.thread_id)
+
+    def report_progress(self, done, total):
+        if self.is_cancelled:
+            raise TaskCancelled()
+
+    def run(self):
+        with self.lock:
+            if self.is_cancelled:
+                raise TaskCancelled()
+            self.thread_id = threading.get_ident()
+        try:
+            return self.fn(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.thread_id = None  # Under the lock so a late cancel can't hit the next call
+
+class AsyncStore:
+    def __init__(self, max_workers=ASYNC_MAX_WORKERS, max_concurrency=ASYNC_MAX_CONCURRENCY,
+                 manager=db_manager, writer=write_queue):
+        self.manager = manager
+        self.writer = writer
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="sqlite-async")
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.closed = False
+
+    async def read(self, fn, *args):
+        return await self.run_call(AsyncCall(self.manager, fn, args, {}))
+
+    async def track(self, fn, *args):
+        # For the long jobs that take progress=: a cancelled call stops at its next batch
+        call = AsyncCall(self.manager, fn, args, {})
+        call.kwargs["progress"] = call.report_progress
+        return await self.run_call(call)
+
+    async def run_call(self, call):
+        return await self.run_held(functools.partial(self.executor.submit, call.run), call.cancel)
+
+    async def write(self, fn, *args):
+        # fn is one of the write functions; cancelling only withdraws a command that hasn't started
+        return await self.run_held(functools.partial(fn, *args, wait=False))
+
+    async def run_held(self, submit, cancel=None):
+        # The semaphore slot is held until the submitted future is done, not just until the caller gives up
+        if self.closed:
+            raise RuntimeError("The store has been closed")
+        await self.semaphore.acquire()
+        try:
+            future = submit()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda done: self.release_slot(loop))
+        try:
+            return await asyncio.wrap_future(future)  # Cancelling withdraws a future that hasn't started
+        except asyncio.CancelledError:
+            if cancel is not None:
+                cancel()
+            raise
+
+    def release_slot(self, loop):
+        try:
+            loop.call_soon_threadsafe(self.semaphore.release)
+        except RuntimeError:
+            pass  # The loop is closed, so nothing can be waiting for the slot
+
+    async def login_user(self, username, password):
+        return await self.read(login_user, username, password)
+
+    async def get_plans_for_user(self, user_id):
+        return await self.read(get_plans_for_user, user_id)
+
+    async def get_plans_page(self, user_id, after_date=None, after_id=None, limit=PLAN_PAGE_SIZE, search=""):
+        return await self.read(get_plans_page, user_id, after_date, after_id, limit, search)
+
+    async def iter_plans(self, user_id, search="", page_size=PLAN_PAGE_SIZE):
+        # Keyset pages are independent queries, so each can run on whichever pool thread is free
+        after_date = after_id = None
+        while True:
+            page = await self.get_plans_page(user_id, after_date, after_id, page_size, search)
+            for plan in page:
+                yield plan
+            if len(page) < page_size:
+                return
+            after_id, after_date = page[-1][0], page[-1][2]
+
+    async def get_plan(self, plan_id):
+        return await self.read(get_plan, plan_id)
+
+    async def get_meals_in_plan(self, plan_id):
+        return await self.read(get_meals_in_plan, plan_id)
+
+    async def get_meals_page(self, plan_id, after_id=None, limit=MEAL_PAGE_SIZE):
+        return await self.read(get_meals_page, plan_id, after_id, limit)
+
+    async def iter_meals(self, plan_id, page_size=MEAL_PAGE_SIZE):
+        after_id = None
+        while True:
+            page = await self.get_meals_page(plan_id, after_id, page_size)
+            for meal in page:
+                yield meal
+            if len(page) < page_size:
+                return
+            after_id = page[-1][0]
+
+    async def get_meal(self, meal_id):
+        return await self.read(get_meal, meal_id)
+
+    async def get_account_info(self, user_id):
+        return await self.read(get_account_info, user_id)
+
+    async def get_data_revision(self, user_id):
+        return await self.read(get_data_revision, user_id)
+
+    async def get_plan_statistics(self, user_id):
+        return await self.read(get_plan_statistics, user_id)
+
+    async def get_analytics_summary(self, user_id):
+        return await self.track(get_analytics_summary, user_id)
+
+    async def import_meals(self, user_id, path, batch_size=IMPORT_BATCH_SIZE):
+        return await self.track(import_meals, user_id, path, batch_size)
+
+    async def export_meals(self, user_id, path, date_from=None, date_to=None, compress=None):
+        return await self.track(export_meals, user_id, path, date_from, date_to, compress)
+
+    async def register_user(self, username, password):
+        # Through the pool rather than write(), so the password is hashed off the event loop
+        return await self.read(register_user, username, password)
+
+    async def update_password(self, user_id, password):
+        return await self.read(update_password, user_id, password)
+
+    async def change_password(self, username, current_password, new_password):
+        return await self.read(change_password, username, current_password, new_password)
+
+    async def update_username(self, user_id, new_username):
+        return await self.write(update_username, user_id, new_username)
+
+    async def create_meal_plan(self, user_id, plan_name, date):
+        return await self.write(create_meal_plan, user_id, plan_name, date)
+
+    async def delete_meal_plan(self, plan_id):
+        return await self.write(delete_meal_plan, plan_id)
+
+    async def clone_plan(self, plan_id, new_name, new_date):
+        return await self.write(clone_plan, plan_id, new_name, new_date)
+
+    async def instantiate_template(self, user_id, template_from, template_to, start_date, end_date):
+        return await self.write(instantiate_template, user_id, template_from, template_to, start_date, end_date)
+
+    async def delete_all_plans(self, user_id):
+        return await self.write(delete_all_plans, user_id)
+
+    async def save_meal(self, user_id, plan_id, meal_name, meal_type, calories, protein, carbs, fats,
+                        preparation_time, category):
+        return await self.write(save_meal, user_id, plan_id, meal_name, meal_type, calories, protein, carbs,
+                                fats, preparation_time, category)
+
+    async def update_meal(self, meal_id, meal_name, meal_type, calories, protein, carbs, fats,
+                          preparation_time, category):
+        return await self.write(update_meal, meal_id, meal_name, meal_type, calories, protein, carbs, fats,
+                                preparation_time, category)
+
+    async def delete_meal(self, meal_id):
+        return await self.write(delete_meal, meal_id)
+
+    def close(self):
+        # Waits for running calls; each pool thread's connections are closed as the thread exits
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.shutdown(wait=True)
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+# Headless reports: `healthyt.py report` writes one summary per user from a process pool
+REPORT_FORMATS = ("json", "csv")
+REPORT_CHUNK_SIZE = 16  # Users per task sent to a worker
+
+def get_report_users(selectors=None):
+    # selectors are user ids or usernames; None means every user
+    with get_read_connection() as conn:
+        users = conn.execute("SELECT id, username FROM users ORDER BY id").fetchall()
+    if not selectors:
+        return users, []
+    by_key = {str(user_id): (user_id, name) for user_id, name in users}
+    by_key.update({name: (user_id, name) for user_id, name in users})
+    found = {by_key[key] for key in selectors if key in by_key}
+    return sorted(found), [key for key in selectors if key not in by_key]
+
+def build_user_report(user_id, username):
+    # The whole user is summarised in one vectorised pass over their meal rows
+    conn = get_read_connection()
+    conn.execute("BEGIN")  # The revision and the rows come from the same snapshot
+    try:
+        revision = read_data_revision(conn, user_id)
+        summary = AnalyticsEngine.load(conn, user_id).compute()
+    finally:
+        conn.rollback()
+    grams = summary['macro_totals']
+    total_grams = sum(value or 0 for value in grams.values())
+    return {
+        'user_id': user_id,
+        'username': username,
+        'revision': revision,
+        'meal_count': summary['meal_count'],
+        'macro_split': {name: {'grams': value or 0, 'percent': (value or 0) * 100 / total_grams if total_grams else 0}
+                        for name, value in grams.items()},
+        'meal_type_averages': {meal_type: {'calories': calories, 'preparation_time': prep}
+                               for meal_type, calories, prep in zip(summary['meal_types'], summary['avg_calories'],
+                                                                    summary['avg_prep'])},
+        'daily_calories': [{'date': date, 'calories': calories}
+                           for date, calories in zip(summary['dates'], summary['daily_calories'])]
+    }
+
+def write_json_report(f, report):
+    json.dump(report, f, indent=2)
+
+def write_csv_report(f, report):
+    # Long format (section, key, metric, value) so one file holds every series
+    writer = csv.writer(f)
+    writer.writerow(["section", "key", "metric", "value"])
+    writer.writerow(["user", report['username'], "meal_count", report['meal_count']])
+    for name, split in report['macro_split'].items():
+        writer.writerows([["macro_split", name, metric, value] for metric, value in split.items()])
+    for meal_type, averages in report['meal_type_averages'].items():
+        writer.writerows([["meal_type_average", meal_type, metric, value] for metric, value in averages.items()])
+    writer.writerows([["daily_calories", day['date'], "calories", day['calories']] for day in report['daily_calories']])
+
+def write_user_reports(users, out_dir, fmt):
+    # Runs in a worker; each file is written beside its name and renamed into place
+    writer = write_json_report if fmt == "json" else write_csv_report
+    results = []
+    for user_id, username in users:
+        path = os.path.join(out_dir, f"{user_id}.{fmt}")
+        try:
+            report = build_user_report(user_id, username)
+            with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+                writer(f, report)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            results.append((user_id, None, f"{type(e).__name__}: {e}"))
+        else:
+            results.append((user_id, path, None))
+    return results
+
+def report_pool(workers):
+    import multiprocessing
+    # fork reuses this Qt-free module; spawn would re-run the script and import the GUI
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+
+def run_reports(users, out_dir, fmt="json", workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = [users[i:i + REPORT_CHUNK_SIZE] for i in range(0, len(users), REPORT_CHUNK_SIZE)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        for chunk in chunks:
+            yield from write_user_reports(chunk, out_dir, fmt)
+        return
+    db_manager.close_all()  # Workers must not inherit an open connection across fork
+    with report_pool(workers) as pool:
+        for results in pool.map(write_user_reports, chunks, [out_dir] * len(chunks), [fmt] * len(chunks)):
+            yield from results
+
+def report_main(argv):
+    parser = argparse.ArgumentParser(prog="healthyt.py report",
+                                     description="Write per-user nutrition summaries without starting the GUI.")
+    parser.add_argument("--user", action="append", dest="users", metavar="USER",
+                        help="username or id to report on; repeat for several (default: every user)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="json")
+    parser.add_argument("--out", default="reports", help="directory for the report files (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    users, missing = get_report_users(args.users)
+    for key in missing:
+        print(f"Unknown user: {key}", file=sys.stderr)
+    if missing:
+        return 2
+    started = time.perf_counter()
+    written = failed = 0
+    for user_id, path, error in run_reports(users, args.out, args.format, args.workers):
+        if error:
+            failed += 1
+            print(f"User {user_id}: {error}", file=sys.stderr)
+        else:
+            written += 1
+    print(f"Wrote {written} report(s) to {args.out} in {time.perf_counter() - started:.2f}s"
+          + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__" and sys.argv[1:2] == ["report"]:
+    sys.exit(report_main(sys.argv[2:]))
+
+# GUI. Nothing above this point needs Qt or matplotlib, so `report` exits before loading them.
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
+                             QLabel, QLineEdit, QPushButton, QComboBox, QScrollArea, QFrame, QDialog,
+                             QMessageBox, QToolTip, QSizePolicy, QDateEdit, QTabWidget, QSpacerItem,
+                             QTableView, QListView, QFileDialog, QHeaderView, QAbstractItemView, QStyledItemDelegate,
+                             QStackedWidget)
+from PyQt6.QtCore import (Qt, QPropertyAnimation, QSize, QPoint, pyqtSignal, QDate, QTimer, QObject,
+                          QRunnable, QThreadPool, QAbstractTableModel, QAbstractListModel, QModelIndex, QRect, QEvent)
+from PyQt6.QtGui import QFont, QPainter, QBrush, QColor, QLinearGradient, QImage, QPixmap
+startup_mark("Qt imported")
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()  # Always the last signal, after result, error or cancelled
+
+class TaskWorker(QRunnable):
+    # Runs fn on the global pool; running_workers keeps it alive until its last signal is delivered
+    running_workers = set()
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.signals = WorkerSignals()
+        self.signals.finished.connect(self.release)
+        self.lock = threading.Lock()
+        self.is_cancelled = False
+        self.thread_id = None
+
+    def start(self):
+        TaskWorker.running_workers.add(self)
+        QThreadPool.globalInstance().start(self)
+
+    def release(self):
+        TaskWorker.running_workers.discard(self)
+
+    def cancel(self, *args):
+        with self.lock:
+            self.is_cancelled = True
+            if self.thread_id is not None:
+                db_manager.interrupt(self.thread_id)  # Abort a long query instead of waiting for it
+
+    def report_progress(self, done, total):
+        if self.is_cancelled:
+            raise TaskCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        with self.lock:
+            self.thread_id = threading.get_ident()
+        try:
+            if self.is_cancelled:
+                raise TaskCancelled()
+            result = self.fn(*self.args, progress=self.report_progress)
+            if self.is_cancelled:
+                raise TaskCancelled()
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()  # Most likely the interrupted query
+            else:
+                self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            with self.lock:
+                self.thread_id = None  # Under the lock so a late cancel can't hit the next task
+            self.signals.finished.emit()
+
+def call_task(fn, *args, progress=None):
+    # Lets TaskWorker run a function that is slow but has no progress to report
+    return fn(*args)
+
+# Theme: one application stylesheet compiled from the palette; widgets only carry names and properties
+BUTTON_COLORS = {  # buttonType: (base, hover)
+    "primary": (PRIMARY_COLOR, PRIMARY_HOVER),
+    "secondary": (SECONDARY_COLOR, SECONDARY_HOVER),
+    "danger": (DANGER_COLOR, DANGER_HOVER),
+    "success": (SUCCESS_COLOR, SUCCESS_HOVER)
+}
+ACCENT_COLORS = {  # accent: text color for QLabels
+    "accent": ACCENT_COLOR,
+    "primary": PRIMARY_COLOR,
+    "success": SUCCESS_COLOR,
+    "amber": CHART_COLORS[2],
+    "purple": CHART_COLORS[3]
+}
+ACCENT_NAMES = {color: name for name, color in ACCENT_COLORS.items()}
+APP_STYLESHEET = None
+
+def gradient(start, stop, horizontal=False):
+    return f"qlineargradient(x1:0, y1:0, x2:1, y2:{0 if horizontal else 1}, stop:0 {start}, stop:1 {stop})"
+
+def compile_stylesheet():
+    rules = [f"""
+        QMainWindow, QDialog {{ background: {PRIMARY_BG}; }}
+        QLabel {{ color: {TEXT_COLOR}; background: transparent; }}
+        QLabel[textStyle="strong"] {{ font-weight: bold; }}
+        QLineEdit, QComboBox, QDateEdit {{
+            background-color: {SECONDARY_BG}; border: 1px solid {BORDER_COLOR}; border-radius: 6px;
+            padding: 8px; color: {TEXT_COLOR}; font-size: 12px;
+        }}
+        QLineEdit[inputSize="large"] {{ border-radius: 8px; padding: 12px; font-size: 14px; }}
+        QComboBox QAbstractItemView, QCalendarWidget QWidget {{
+            background-color: {SECONDARY_BG}; color: {TEXT_COLOR}; selection-background-color: {PRIMARY_COLOR};
+        }}
+        QMessageBox QPushButton {{
+            background: {SECONDARY_COLOR}; color: {TEXT_COLOR}; border: 1px solid {BORDER_COLOR};
+            border-radius: 6px; padding: 6px 18px;
+        }}
+        QMessageBox QPushButton:hover {{ background: {SECONDARY_HOVER}; }}
+        QFrame[frameRole="card"] {{ background: {CARD_BG}; border: 1px solid {BORDER_COLOR}; border-radius: 16px; }}
+        QFrame[frameRole="section"] {{ background: {CARD_BG}; border: 1px solid {SUBTLE_BORDER_COLOR}; border-radius: 12px; }}
+        QFrame[frameRole="panel"] {{ background: {SECONDARY_BG}; border: 1px solid {BORDER_COLOR}; border-radius: 8px; }}
+        QFrame#brandPanel {{ background: {gradient(CARD_BG, PRIMARY_COLOR)}; border-right: 1px solid {SUBTLE_BORDER_COLOR}; }}
+        QFrame#authForm {{ background: {CARD_BG}; border-radius: 15px; padding: 30px; }}
+        QFrame#appHeader {{ background: {gradient(PRIMARY_BG, SECONDARY_BG, horizontal=True)}; border-bottom: 1px solid {BORDER_COLOR}; }}
+        QFrame#heroCard {{
+            background: {gradient(CARD_BG, SECONDARY_BG)}; border: 1px solid {BORDER_COLOR}; border-radius: 16px; padding: 30px;
+        }}
+        QScrollArea#mealsScroll, QScrollArea#mealsScroll > QWidget#qt_scrollarea_viewport, QWidget#mealsContent {{
+            background: transparent; border: none;
+        }}
+        QListView#planList {{ background: transparent; border: none; color: {TEXT_COLOR}; outline: none; }}
+        QListView#planList::item {{
+            background: {gradient(SECONDARY_COLOR, SECONDARY_COLOR + "80")}; border: 1px solid {BORDER_COLOR};
+            border-radius: 8px; padding: 12px; margin: 5px 0;
+        }}
+        QListView#planList::item:hover {{ background: {SECONDARY_HOVER}; }}
+        QListView#planList::item:selected {{ background: {PRIMARY_COLOR}; color: {TEXT_COLOR}; }}
+        QTableView#mealTable {{
+            background: {CARD_BG}; alternate-background-color: {SECONDARY_BG}; color: {TEXT_COLOR};
+            border: 1px solid {BORDER_COLOR}; border-radius: 6px; selection-background-color: {BORDER_COLOR};
+        }}
+        QTableView#mealTable QHeaderView::section {{
+            background: {SECONDARY_BG}; color: {TEXT_COLOR}; border: none; border-bottom: 1px solid {BORDER_COLOR};
+            padding: 6px; font-weight: bold;
+        }}
+        QTabWidget#mealTabs::pane {{ background: {CARD_BG}; border: none; }}
+        QTabWidget#mealTabs QTabBar::tab {{
+            background: {SECONDARY_BG}; color: {TEXT_COLOR}; border: 1px solid {BORDER_COLOR}; border-radius: 6px;
+            padding: 8px; margin-right: 2px;
+        }}
+        QTabWidget#mealTabs QTabBar::tab:selected {{ background: {PRIMARY_COLOR}; }}
+        QTabWidget#analyticsTabs::pane {{
+            background: {CARD_BG}; border: 1px solid {BORDER_COLOR}; border-radius: 12px; padding: 10px 10px 0 10px;
+        }}
+        QTabWidget#analyticsTabs QTabBar {{ alignment: center; }}
+        QTabWidget#analyticsTabs QTabBar::tab {{
+            background: {SECONDARY_BG}; color: {TEXT_COLOR}; border: 1px solid {BORDER_COLOR}; border-radius: 8px;
+            padding: 12px 20px; margin-right: 10px; margin-left: 10px; font-weight: 500;
+        }}
+        QTabWidget#analyticsTabs QTabBar::tab:hover {{
+            background: {gradient(PRIMARY_COLOR, PRIMARY_COLOR + "80")}; border: 1px solid {PRIMARY_COLOR};
+        }}
+        QTabWidget#analyticsTabs QTabBar::tab:selected {{
+            background: {gradient(PRIMARY_COLOR, PRIMARY_COLOR + "60")}; border: 1px solid {PRIMARY_COLOR};
+        }}
+    """]
+    for button_type, (base, hover) in BUTTON_COLORS.items():
+        rules.append(f"""
+        QPushButton[buttonType="{button_type}"] {{
+            background: {gradient(base, base + "80")}; color: {TEXT_COLOR}; border: 1px solid {BORDER_COLOR};
+            border-radius: 8px; padding: 12px; font-weight: 500;
+        }}
+        QPushButton[buttonType="{button_type}"]:hover {{ background: {gradient(hover, hover + "80")}; border: 1px solid {base}; }}
+        QPushButton[buttonType="{button_type}"]:pressed {{ background: {gradient(hover + "80", hover + "40")}; }}
+        """)
+    for accent, color in ACCENT_COLORS.items():
+        rules.append(f'QLabel[accent="{accent}"] {{ color: {color}; }}')
+    return "\n".join(rules)
+
+def apply_theme(app):
+    global APP_STYLESHEET
+    if APP_STYLESHEET is None:
+        APP_STYLESHEET = compile_stylesheet()
+    if app.styleSheet() != APP_STYLESHEET:
+        app.setStyleSheet(APP_STYLESHEET)
+
 class AnimatedButton(QPushButton):
     def __init__(self, text, parent=None, button_type="primary"):
         super().__init__(text, parent)
@@ -187,42 +1798,7 @@ class AnimatedButton(QPushButton):
         self.setMinimumHeight(45)
         self.setFont(QFont("Roboto", 11, QFont.Weight.Medium))
         
-        base_color = {
-            "primary": PRIMARY_COLOR,    # Green for proceed actions
-            "secondary": SECONDARY_COLOR, # Gray for neutral actions
-            "danger": DANGER_COLOR,      # Red for delete actions
-            "success": SUCCESS_COLOR     # Teal for success actions
-        }
-        hover_color = {
-            "primary": PRIMARY_HOVER,    # Darker green
-            "secondary": SECONDARY_HOVER, # Darker gray
-            "danger": DANGER_HOVER,      # Darker red
-            "success": SUCCESS_HOVER     # Darker teal
-        }
-
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                          stop:0 {base_color[self.button_type]}, 
-                                          stop:1 {base_color[self.button_type]}80);
-                color: {TEXT_COLOR};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px;
-                font-weight: 500;
-            }}
-            QPushButton:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                          stop:0 {hover_color[self.button_type]}, 
-                                          stop:1 {hover_color[self.button_type]}80);
-                border: 1px solid {base_color[self.button_type]};
-            }}
-            QPushButton:pressed {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                          stop:0 {hover_color[self.button_type]}80, 
-                                          stop:1 {hover_color[self.button_type]}40);
-            }}
-        """)
+        self.setProperty("buttonType", button_type)  # Styled by the application stylesheet
         self.animation = QPropertyAnimation(self, b"maximumSize")
         self.animation.setDuration(150)
         self.setMouseTracking(True)
@@ -244,7 +1820,6 @@ class MealCreatorDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Add/Edit Meal")
         self.setMinimumSize(600, 600)
-        self.setStyleSheet(f"background: {PRIMARY_BG};")
         self.meal_data = meal_data
         self.plan_id = plan_id
         self.user_id = user_id
@@ -257,16 +1832,11 @@ class MealCreatorDialog(QDialog):
 
         title = QLabel("Add/Edit Meal")
         title.setFont(QFont("Roboto", 20, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR}; background: transparent;")
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         main_layout.addWidget(title)
 
         form_frame = QFrame()
-        form_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 12px;
-            border: 1px solid {BORDER_COLOR};
-        """)
+        form_frame.setProperty("frameRole", "section")
         form_layout = QGridLayout(form_frame)
         form_layout.setContentsMargins(15, 15, 15, 15)
         form_layout.setSpacing(10)
@@ -285,60 +1855,20 @@ class MealCreatorDialog(QDialog):
         for idx, (label_text, widget, placeholder) in enumerate(fields):
             label = QLabel(label_text)
             label.setFont(QFont("Roboto", 11))
-            label.setStyleSheet(f"color: {TEXT_COLOR};")
             widget.setPlaceholderText(placeholder)
             widget.setMinimumHeight(30)
-            widget.setStyleSheet(f"""
-                background-color: {SECONDARY_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 6px;
-                padding: 8px;
-                color: {TEXT_COLOR};
-                font-size: 12px;
-            """)
             form_layout.addWidget(label, idx, 0)
             form_layout.addWidget(widget, idx, 1)
 
         self.type_box = QComboBox()
-        self.type_box.addItems(["Breakfast", "Lunch", "Dinner", "Snack"])
+        self.type_box.addItems(MEAL_TYPES)
         self.type_box.setMinimumHeight(30)
-        self.type_box.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 8px;
-            color: {TEXT_COLOR};
-            font-size: 12px;
-        """)
         form_layout.addWidget(QLabel("Meal Type"), len(fields), 0)
         form_layout.addWidget(self.type_box, len(fields), 1)
 
         self.category_box = QComboBox()
-        self.category_box.addItems([
-            "Not Specified",
-            "Vegetarian",
-            "Vegan",
-            "Keto",
-            "Gluten-Free",
-            "Paleo",
-            "Low-Carb",
-            "High-Protein",
-            "Dairy-Free",
-            "Low-Fat",
-            "Whole30",
-            "Mediterranean",
-            "Low-Sodium",
-            "Pescatarian"
-        ])
+        self.category_box.addItems(MEAL_CATEGORIES)
         self.category_box.setMinimumHeight(30)
-        self.category_box.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 8px;
-            color: {TEXT_COLOR};
-            font-size: 12px;
-        """)
         form_layout.addWidget(QLabel("Category"), len(fields) + 1, 0)
         form_layout.addWidget(self.category_box, len(fields) + 1, 1)
 
@@ -365,36 +1895,265 @@ class MealCreatorDialog(QDialog):
             self.prep_time_entry.setText(str(prep))
 
     def submit(self):
-        mname = self.name_entry.text().strip()
-        mtype = self.type_box.currentText()
-        cat = self.category_box.currentText()
         try:
-            cal = float(self.calories_entry.text().strip() or 0)
-            pro = float(self.protein_entry.text().strip() or 0)
-            carb = float(self.carbs_entry.text().strip() or 0)
-            fat = float(self.carbs_entry.text().strip() or 0)
-            prep = int(self.prep_time_entry.text().strip() or 0)
-        except ValueError:
-            QMessageBox.critical(self, "Error", "Please enter valid numbers for nutritional values and prep time.")
+            meal = validate_meal(self.name_entry.text(), self.type_box.currentText(),
+                                 self.calories_entry.text(), self.protein_entry.text(), self.carbs_entry.text(),
+                                 self.fats_entry.text(), self.prep_time_entry.text(),
+                                 self.category_box.currentText())
+        except MealValidationError as e:
+            QMessageBox.critical(self, "Error", str(e))
             return
-
-        if mname:
-            if cal < 0 or pro < 0 or carb < 0 or fat < 0 or prep < 0:
-                QMessageBox.critical(self, "Error", "Nutritional values and prep time cannot be negative.")
-                return
-            if self.meal_data:
-                update_meal(self.meal_data[0], mname, mtype, cal, pro, carb, fat, prep, cat)
-            else:
-                save_meal(self.user_id, self.plan_id, mname, mtype, cal, pro, carb, fat, prep, cat)
-            self.accept()
+        if self.meal_data:
+            write_behind(update_meal, self.meal_data[0], *meal)
         else:
-            QMessageBox.critical(self, "Error", "Please fill in the required field (Meal Name).")
-
-class FigureCanvas(FigureCanvas):
-    enlarged = pyqtSignal(object, object)
+            write_behind(save_meal, self.user_id, self.plan_id, *meal)
+        self.accept()
+
+# matplotlib loads on first use, or in prewarm_imports once the login window has painted
+PREWARM_IMPORTS = True
+Figure = None
+ChartCanvas = None
+charting_lock = threading.Lock()
+
+def load_charting():
+    global Figure, ChartCanvas
+    with charting_lock:
+        if ChartCanvas is None:
+            from matplotlib.figure import Figure as figure_class
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+            Figure = figure_class
+            ChartCanvas = type("ChartCanvas", (ChartCanvasMixin, FigureCanvasQTAgg),
+                               {"enlarged": pyqtSignal(object, object)})
+
+def make_chart_canvas(figure, meals_data, chart_type, parent=None):
+    load_charting()
+    return ChartCanvas(figure, meals_data, chart_type, parent)
+
+def prewarm_imports():
+    try:
+        np.ndarray
+        load_charting()
+    except Exception:
+        traceback.print_exc()  # The screens will import on demand and report it properly
+
+# Plain Figure objects, never pyplot, so each lives only as long as its canvas
+LIVE_FIGURES = weakref.WeakSet()
+
+def new_figure(figsize):
+    load_charting()
+    figure = Figure(figsize=figsize)
+    LIVE_FIGURES.add(figure)
+    return figure
+
+def copy_figure(figure):
+    import pickle
+    # A figure can only be attached to one canvas, so other views get their own copy
+    figure_copy = pickle.loads(pickle.dumps(figure))
+    LIVE_FIGURES.add(figure_copy)
+    return figure_copy
+
+def release_figure(figure, *args):
+    figure.clear()
+    LIVE_FIGURES.discard(figure)
+
+def live_figure_count():
+    return len(LIVE_FIGURES)
+
+def clear_tabs(tab_widget):
+    # QTabWidget.clear() only detaches pages, so delete them (and their canvases) explicitly
+    while tab_widget.count():
+        page = tab_widget.widget(0)
+        tab_widget.removeTab(0)
+        page.deleteLater()
+
+def chart_slug(title):
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+CHART_FILE_PATTERN = re.compile(r"([a-z]+)-(\d+)-([a-z0-9-]+)-(\d+)x(\d+)-r(\d+)\.png")
+
+class ChartCache:
+    # Chart pixmaps by (scope, owner id, chart, width, height, revision): an LRU plus optional PNGs on disk
+    def __init__(self, max_bytes, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.disk_files = None
+        # Paths in disk_files, so a PNG writer doesn't restore a file replaced meanwhile
+        self.disk_lock = threading.Lock()
+        self.live_paths = set()
+
+    def file_path(self, key):
+        scope, owner_id, chart, width, height, revision = key
+        return os.path.join(self.disk_dir, f"{scope}-{owner_id}-{chart}-{width}x{height}-r{revision}.png")
+
+    def disk_index(self):
+        if self.disk_files is None:
+            self.disk_files = {}
+            if self.disk_dir and os.path.isdir(self.disk_dir):
+                for name in os.listdir(self.disk_dir):
+                    match = CHART_FILE_PATTERN.fullmatch(name)
+                    if match:
+                        scope, owner_id, chart, width, height, revision = match.groups()
+                        files = self.disk_files.setdefault((scope, int(owner_id), chart), {})
+                        files[int(width), int(height), int(revision)] = os.path.join(self.disk_dir, name)
+                self.live_paths.update(path for files in self.disk_files.values() for path in files.values())
+        return self.disk_files
+
+    def has_revision(self, prefix, revision):
+        if any(key[:3] == prefix and key[5] == revision for key in self.entries):
+            return True
+        return any(rev == revision for _, _, rev in self.disk_index().get(prefix, ()))
+
+    def get(self, key):
+        pixmap = self.entries.get(key)
+        if pixmap is not None:
+            self.entries.move_to_end(key)
+            return pixmap
+        path = self.disk_index().get(key[:3], {}).get(key[3:])
+        if path:
+            pixmap = QPixmap(path)
+            if not pixmap.isNull():
+                pixmap.setDevicePixelRatio(pixmap.width() / key[3])  # PNGs don't keep the ratio
+                self.remember(key, pixmap)
+                return pixmap
+        return None
+
+    def put(self, key, pixmap):
+        self.discard_older(key[:3], key[5])
+        self.remember(key, pixmap)
+        if self.disk_dir:
+            files = self.disk_index().setdefault(key[:3], {})
+            for other in [k for k in files if k != key[3:]]:
+                self.drop_file(files.pop(other))  # Other sizes of this chart, e.g. before a resize
+            # Encoding a PNG takes a while, so write it from the thread pool
+            path = files[key[3:]] = self.file_path(key)
+            with self.disk_lock:
+                self.live_paths.add(path)
+            image = pixmap.toImage()
+            QThreadPool.globalInstance().start(lambda: self.write_image(image, path))
+
+    def write_image(self, image, path):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        if image.save(temp_path, "PNG"):
+            with self.disk_lock:
+                if path in self.live_paths:
+                    os.replace(temp_path, path)
+                    return
+            remove_file(temp_path)
+
+    def drop_file(self, path):
+        with self.disk_lock:
+            self.live_paths.discard(path)
+            remove_file(path)
+
+    def remember(self, key, pixmap):
+        if key in self.entries:
+            self.total_bytes -= self.pixmap_bytes(self.entries.pop(key))
+        self.entries[key] = pixmap
+        self.total_bytes += self.pixmap_bytes(pixmap)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= self.pixmap_bytes(evicted)
+
+    def discard_older(self, prefix, revision):
+        for stale in [k for k in self.entries if k[:len(prefix)] == prefix and k[5] < revision]:
+            self.total_bytes -= self.pixmap_bytes(self.entries.pop(stale))
+        for chart, files in self.disk_index().items():
+            if chart[:len(prefix)] == prefix:
+                for stale in [k for k in files if k[2] < revision]:
+                    self.drop_file(files.pop(stale))
+
+    def on_data_changed(self, user_id, revision):
+        self.discard_older(('user', user_id), revision)
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+def chart_cache_dir(root):
+    # One directory per database id; anything else under root belongs to a database that is gone
+    if root is None:
+        return None
+    database_id = get_database_id()
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            if name != database_id:
+                path = os.path.join(root, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    remove_file(path)
+    return os.path.join(root, database_id)
+
+class DataEvents(QObject):
+    # Change notifications as typed signals, delivered queued on the GUI thread
+    meal_saved = pyqtSignal(int, int, int, int)  # user_id, plan_id, meal_id, revision
+    meal_updated = pyqtSignal(int, int, int, int)
+    meal_deleted = pyqtSignal(int, int, int, int)
+    plan_created = pyqtSignal(int, int, int)  # user_id, plan_id, revision
+    plan_deleted = pyqtSignal(int, int, int)
+    plans_cleared = pyqtSignal(int, int)  # user_id, revision
+    meals_imported = pyqtSignal(int, int)
+    plans_generated = pyqtSignal(int, int)
+    username_changed = pyqtSignal(int, int)
+    data_changed = pyqtSignal(int, int)  # Follows every one of the above
+
+    def emit_change(self, event, user_id, plan_id, meal_id, revision):
+        if event in (MEAL_SAVED, MEAL_UPDATED, MEAL_DELETED):
+            getattr(self, event).emit(user_id, plan_id, meal_id, revision)
+        elif event in (PLAN_CREATED, PLAN_DELETED):
+            getattr(self, event).emit(user_id, plan_id, revision)
+        else:
+            getattr(self, event).emit(user_id, revision)
+        self.data_changed.emit(user_id, revision)
+
+class WriteResults(QObject):
+    # Brings write-queue completions back to the GUI thread
+    finished = pyqtSignal(object, object)  # callback, future
+    failed = pyqtSignal(str)
+
+    def deliver(self, callback, future):
+        error = future.exception()
+        if error is not None:
+            self.failed.emit(str(error))
+        elif callback is not None:
+            callback(future.result())
+
+chart_cache = data_events = write_results = None  # Set by start_gui_services
+
+def start_gui_services():
+    # Run by the main window, so importing the module has no GUI side effects
+    global chart_cache, data_events, write_results
+    if data_events is not None:
+        return
+    chart_cache = ChartCache(CHART_CACHE_BYTES, chart_cache_dir(CHART_CACHE_DIR))
+    data_events = DataEvents()
+    add_change_listener(data_events.emit_change)
+    data_events.data_changed.connect(chart_cache.on_data_changed)
+    write_results = WriteResults()
+    write_results.finished.connect(write_results.deliver)
+    atexit.register(write_queue.flush)  # Runs before PyQt's exit cleanup deletes the objects results go to
+
+def write_behind(fn, *args, callback=None):
+    # Queues a write; callback(result) runs on the GUI thread after the commit
+    future = fn(*args, wait=False)
+    future.add_done_callback(lambda done: write_results.finished.emit(callback, done))
+    return future
+
+class ChartCanvasMixin:
+    # Body of ChartCanvas, which load_charting combines with the matplotlib canvas class
 
     def __init__(self, figure, meals_data, chart_type, parent=None):
         super().__init__(figure)
+        self.destroyed.connect(functools.partial(release_figure, figure))
         self.meals_data = meals_data
         self.chart_type = chart_type
         self.parent_widget = parent
@@ -425,47 +2184,825 @@ class FigureCanvas(FigureCanvas):
         if event.button == 1:
             self.enlarged.emit(self.chart_type, self.figure)
 
+def update_pie(wedges, texts, autotexts, sizes, autopct, startangle=90, labeldistance=1.1, pctdistance=0.6):
+    # Move existing wedges and their labels to new proportions, the same geometry ax.pie() uses
+    fractions = np.asarray(sizes, dtype=float) / np.sum(sizes)
+    angles = startangle + 360 * np.concatenate([[0], np.cumsum(fractions)])
+    for i, wedge in enumerate(wedges):
+        wedge.set_theta1(angles[i])
+        wedge.set_theta2(angles[i + 1])
+        middle = np.deg2rad((angles[i] + angles[i + 1]) / 2)
+        x, y = np.cos(middle), np.sin(middle)
+        texts[i].set_position((labeldistance * x, labeldistance * y))
+        texts[i].set_horizontalalignment('left' if x > 0 else 'right')
+        autotexts[i].set_position((pctdistance * x, pctdistance * y))
+        autotexts[i].set_text(autopct % (fractions[i] * 100))
+
+class AnalyticsChart(ABC):
+    chart_type = 'bar'
+
+    # Keeps its figure between refreshes and redraws only when the layout key changes
+    def __init__(self, figsize=(12, 9)):
+        self.figure = new_figure(figsize)
+        self.figure.patch.set_facecolor(CARD_BG)
+        self.ax = self.figure.subplots()
+        self.layout_key = None
+
+    def update(self, series):
+        layout_key = self.get_layout_key(series)
+        if layout_key != self.layout_key:
+            self.ax.clear()
+            self.layout_key = layout_key
+            if layout_key is not None:  # None means nothing to plot, leave the axes blank
+                self.draw(series)
+        elif layout_key is not None:
+            self.refresh(series)
+            self.ax.relim()
+            self.ax.autoscale_view()
+        self.figure.canvas.draw_idle()
+
+    @abstractmethod
+    def get_layout_key(self, series):
+        pass
+
+    @abstractmethod
+    def draw(self, series):
+        pass
+
+    @abstractmethod
+    def refresh(self, series):
+        pass
+
+class MacroChart(AnalyticsChart):
+    chart_type = 'pie'
+
+    def get_layout_key(self, series):
+        return 'macros' if sum(series['macro_totals'].values()) > 0 else None
+
+    def draw(self, series):
+        macro_counts = series['macro_totals']
+        total = sum(macro_counts.values())
+        labels = list(macro_counts.keys())
+        sizes = [v/total*100 for v in macro_counts.values()]
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            sizes, labels=labels, autopct='%1.1f%%', startangle=90,
+            textprops={'fontsize': 14, 'color': TEXT_COLOR}, colors=CHART_COLORS[:3])
+        self.ax.axis('equal')
+        self.ax.set_title("Macronutrient Distribution", color=TEXT_COLOR, fontsize=16)
+
+    def refresh(self, series):
+        update_pie(self.wedges, self.texts, self.autotexts, list(series['macro_totals'].values()), '%1.1f%%')
+
+class MealTypeBarChart(AnalyticsChart):
+    def __init__(self, series_key, color, ylabel, title):
+        super().__init__()
+        self.series_key = series_key
+        self.color = color
+        self.ylabel = ylabel
+        self.title = title
+
+    def get_layout_key(self, series):
+        return tuple(series['meal_types']) if any(series[self.series_key]) else None
+
+    def draw(self, series):
+        self.bars = self.ax.bar(series['meal_types'], series[self.series_key], color=self.color, edgecolor=BORDER_COLOR)
+        self.ax.set_ylabel(self.ylabel, color=TEXT_COLOR, fontsize=14)
+        self.ax.set_title(self.title, color=TEXT_COLOR, fontsize=16)
+        self.ax.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
+        self.ax.tick_params(colors=TEXT_COLOR, labelsize=12)
+
+    def refresh(self, series):
+        for bar, value in zip(self.bars, series[self.series_key]):
+            bar.set_height(value)
+
+class DailyTrendChart(AnalyticsChart):
+    chart_type = 'line'
+
+    def get_layout_key(self, series):
+        return 'trend' if series['daily_calories'] else None
+
+    def draw(self, series):
+        self.line, = self.ax.plot([], [], marker='o', color=CHART_COLORS[1])
+        self.refresh(series)
+        self.ax.set_xlabel('Date', color=TEXT_COLOR, fontsize=14)
+        self.ax.set_ylabel('Total Calories (kcal)', color=TEXT_COLOR, fontsize=14)
+        self.ax.set_title('Daily Calorie Trend', color=TEXT_COLOR, fontsize=16)
+        self.ax.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
+        self.ax.tick_params(axis='x', rotation=45, colors=TEXT_COLOR, labelsize=12)
+        self.ax.tick_params(axis='y', colors=TEXT_COLOR, labelsize=12)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def refresh(self, series):
+        # Plot against positions and label the ticks, so new dates can be set without re-plotting
+        positions = np.arange(len(series['dates']))
+        self.line.set_data(positions, series['daily_calories'])
+        self.ax.set_xticks(positions, series['dates'])
+
+class CategoryChart(AnalyticsChart):
+    chart_type = 'pie'
+
+    def get_layout_key(self, series):
+        return tuple(series['category_labels']) or None
+
+    def draw(self, series):
+        labels = series['category_labels']
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            series['category_counts'], labels=labels, autopct='%1.1f%%', startangle=90,
+            textprops={'fontsize': 14, 'color': TEXT_COLOR}, colors=CHART_COLORS[:len(labels)])
+        self.ax.axis('equal')
+        self.ax.set_title("Meal Category Distribution", color=TEXT_COLOR, fontsize=16)
+
+    def refresh(self, series):
+        update_pie(self.wedges, self.texts, self.autotexts, series['category_counts'], '%1.1f%%')
+
+class ProteinChart(AnalyticsChart):
+    def get_layout_key(self, series):
+        if not series['avg_protein'].any():
+            return None
+        return tuple(series['protein_categories']), tuple(series['meal_types'])
+
+    def draw(self, series):
+        meal_types = series['meal_types']
+        self.stacks = []
+        for idx, cat in enumerate(series['protein_categories']):
+            self.stacks.append(self.ax.bar(meal_types, np.zeros(len(meal_types)), label=cat,
+                                           color=CHART_COLORS[idx % len(CHART_COLORS)]))
+        self.refresh(series)
+        self.ax.set_ylabel('Average Protein (g)', color=TEXT_COLOR, fontsize=14)
+        self.ax.set_title('Average Protein by Meal Type and Category', color=TEXT_COLOR, fontsize=16)
+        self.ax.legend(fontsize=12, loc='upper right', facecolor=CARD_BG, edgecolor=BORDER_COLOR, labelcolor=TEXT_COLOR)
+        self.ax.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
+        self.ax.tick_params(colors=TEXT_COLOR, labelsize=12)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def refresh(self, series):
+        avg_protein = series['avg_protein']
+        bottoms = np.vstack([np.zeros(avg_protein.shape[1]), np.cumsum(avg_protein, axis=0)[:-1]])
+        for bars, heights, bottom in zip(self.stacks, avg_protein, bottoms):
+            for bar, height, y in zip(bars, heights, bottom):
+                bar.set_y(y)
+                bar.set_height(height)
+
+# Analytics tabs in display order: (tab title, chart factory)
+ANALYTICS_CHARTS = [
+    ("Macronutrient Distribution", MacroChart),
+    ("Calories by Meal Type", functools.partial(MealTypeBarChart, 'avg_calories', CHART_COLORS[0],
+                                                'Average Calories (kcal)', 'Average Calories by Meal Type')),
+    ("Daily Calorie Trend", DailyTrendChart),
+    ("Prep Time by Meal Type", functools.partial(MealTypeBarChart, 'avg_prep', CHART_COLORS[2],
+                                                 'Average Prep Time (min)', 'Average Prep Time by Meal Type')),
+    ("Meal Category Distribution", CategoryChart),
+    ("Protein by Meal Type and Category", ProteinChart)
+]
+
+MEAL_DETAILS = [
+    ("Type", TEXT_COLOR, lambda meal: meal[2]),
+    ("Calories", ACCENT_COLOR, lambda meal: f"{meal[3]:.1f} kcal"),
+    ("Protein", SUCCESS_COLOR, lambda meal: f"{meal[4]:.1f} g"),
+    ("Carbs", CHART_COLORS[2], lambda meal: f"{meal[5]:.1f} g"),
+    ("Fats", CHART_COLORS[3], lambda meal: f"{meal[6]:.1f} g"),
+    ("Prep Time", TEXT_COLOR, lambda meal: f"{meal[7]} min"),
+    ("Category", TEXT_COLOR, lambda meal: meal[8])
+]
+
+class MealTab(QWidget):
+    edit_requested = pyqtSignal(object)
+    delete_requested = pyqtSignal(int)
+
+    # One meal in the plan view. Built once; later edits only change the label text.
+    def __init__(self, meal, parent=None):
+        super().__init__(parent)
+        self.meal = None
+        tab_layout = QVBoxLayout(self)
+        tab_layout.setContentsMargins(10, 10, 10, 10)
+        tab_layout.setSpacing(5)
+
+        details_layout = QGridLayout()
+        details_layout.setSpacing(5)
+        self.value_labels = []
+        for idx, (label, color, value) in enumerate(MEAL_DETAILS):
+            lbl = QLabel(label)
+            lbl.setProperty("textStyle", "strong")
+            val = QLabel()
+            if color in ACCENT_NAMES:
+                val.setProperty("accent", ACCENT_NAMES[color])
+            details_layout.addWidget(lbl, idx, 0)
+            details_layout.addWidget(val, idx, 1)
+            self.value_labels.append(val)
+        tab_layout.addLayout(details_layout)
+
+        actions_layout = QHBoxLayout()
+        edit_button = AnimatedButton("Edit", button_type="success")
+        edit_button.clicked.connect(lambda: self.edit_requested.emit(self.meal))
+        delete_button = AnimatedButton("Delete", button_type="danger")
+        delete_button.clicked.connect(lambda: self.delete_requested.emit(self.meal[0]))
+        actions_layout.addWidget(edit_button)
+        actions_layout.addWidget(delete_button)
+        tab_layout.addLayout(actions_layout)
+
+        self.set_meal(meal)
+
+    def set_meal(self, meal):
+        if meal == self.meal:
+            return False
+        self.meal = meal
+        for val, (label, color, value) in zip(self.value_labels, MEAL_DETAILS):
+            val.setText(value(meal))
+        return True
+
+MEAL_COLUMNS = [("Meal", TEXT_COLOR, lambda meal: meal[1])] + MEAL_DETAILS  # Column n shows meal[n + 1]
+
+class MealTableModel(QAbstractTableModel):
+    # Meals of one plan as row tuples, sorted and filtered here so the view stays thin
+    def __init__(self, meals=(), parent=None):
+        super().__init__(parent)
+        self.meals = list(meals)
+        self.rows = list(self.meals)
+        self.filter_text = ""
+        self.sort_column = None
+        self.sort_order = Qt.SortOrder.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(MEAL_COLUMNS) + 1
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return MEAL_COLUMNS[section][0] if section < len(MEAL_COLUMNS) else "Actions"
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        meal = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.UserRole:
+            return meal
+        if column >= len(MEAL_COLUMNS):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return MEAL_COLUMNS[column][2](meal)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return QColor(MEAL_COLUMNS[column][1])
+        if role == Qt.ItemDataRole.TextAlignmentRole and isinstance(meal[column + 1], (int, float)):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def matches(self, meal):
+        text = self.filter_text
+        return not text or any(text in str(value).lower() for value in (meal[1], meal[2], meal[8]))
+
+    def sort_key(self, meal):
+        value = meal[self.sort_column + 1]
+        return (value is None, value)
+
+    def apply_view(self):
+        rows = [meal for meal in self.meals if self.matches(meal)]
+        if self.sort_column is not None:
+            rows.sort(key=self.sort_key, reverse=self.sort_order == Qt.SortOrder.DescendingOrder)
+        return rows
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if not 0 <= column < len(MEAL_COLUMNS):
+            return
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column, self.sort_order = column, order
+        self.rows = self.apply_view()
+        self.layoutChanged.emit()
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self.filter_text = text.strip().lower()
+        self.rows = self.apply_view()
+        self.endResetModel()
+
+    def set_meals(self, meals):
+        meals = list(meals)
+        if meals == self.meals:
+            return
+        self.beginResetModel()
+        self.meals = meals
+        self.rows = self.apply_view()
+        self.endResetModel()
+
+    def row_of(self, meal_id):
+        for row, meal in enumerate(self.rows):
+            if meal[0] == meal_id:
+                return row
+        return -1
+
+    def insert_row(self, meal):
+        row = len(self.rows)
+        if self.sort_column is not None:
+            descending = self.sort_order == Qt.SortOrder.DescendingOrder
+            key = self.sort_key(meal)
+            for i, other in enumerate(self.rows):
+                if (self.sort_key(other) < key) if descending else (key < self.sort_key(other)):
+                    row = i
+                    break
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.insert(row, meal)
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+
+    def add_meal(self, meal):
+        self.meals.append(meal)
+        if self.matches(meal):
+            self.insert_row(meal)
+
+    def update_meal(self, meal):
+        for i, old in enumerate(self.meals):
+            if old[0] == meal[0]:
+                self.meals[i] = meal
+                break
+        else:
+            return self.add_meal(meal)
+        row = self.row_of(meal[0])
+        if row >= 0 and self.matches(meal) and (self.sort_column is None or self.sort_key(old) == self.sort_key(meal)):
+            self.rows[row] = meal
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(MEAL_COLUMNS) - 1))
+            return
+        # Filter membership or sort position changed, so move just this row
+        if row >= 0:
+            self.remove_row(row)
+        if self.matches(meal):
+            self.insert_row(meal)
+
+    def remove_meal(self, meal_id):
+        self.meals = [meal for meal in self.meals if meal[0] != meal_id]
+        row = self.row_of(meal_id)
+        if row >= 0:
+            self.remove_row(row)
+
+class MealActionsDelegate(QStyledItemDelegate):
+    edit_requested = pyqtSignal(object)
+    delete_requested = pyqtSignal(int)
+
+    # Paints Edit/Delete in the actions column instead of creating two buttons per row
+    ACTIONS = [("Edit", SUCCESS_COLOR), ("Delete", DANGER_COLOR)]
+
+    def action_rects(self, rect):
+        width = (rect.width() - 4 * (len(self.ACTIONS) + 1)) // len(self.ACTIONS)
+        return [QRect(rect.left() + 4 + i * (width + 4), rect.top() + 4, width, rect.height() - 8)
+                for i in range(len(self.ACTIONS))]
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for (text, color), rect in zip(self.ACTIONS, self.action_rects(option.rect)):
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QBrush(QColor(color)))
+            painter.drawRoundedRect(rect, 6, 6)
+            painter.setPen(QColor(TEXT_COLOR))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(160, 36)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            meal = index.data(Qt.ItemDataRole.UserRole)
+            edit_rect, delete_rect = self.action_rects(option.rect)
+            if edit_rect.contains(event.position().toPoint()):
+                self.edit_requested.emit(meal)
+                return True
+            if delete_rect.contains(event.position().toPoint()):
+                self.delete_requested.emit(meal[0])
+                return True
+        return False
+
+class MealTableView(QWidget):
+    def __init__(self, meals=(), parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        layout.setSpacing(8)
+
+        self.filter_entry = QLineEdit()
+        self.filter_entry.setPlaceholderText("Filter by name, type or category")
+        layout.addWidget(self.filter_entry)
+
+        self.model = MealTableModel(meals, self)
+        self.filter_entry.textChanged.connect(self.model.set_filter)
+        self.actions = MealActionsDelegate(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegateForColumn(len(MEAL_COLUMNS), self.actions)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.table.setShowGrid(False)
+        self.table.setAlternatingRowColors(True)
+        # Fixed row heights let the view map scroll offsets to rows without measuring every row
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(36)
+        self.table.verticalHeader().hide()
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        header.resizeSection(len(MEAL_COLUMNS), 160)
+        self.table.setObjectName("mealTable")
+        layout.addWidget(self.table)
+
+class PlanListModel(QAbstractListModel):
+    # A user's plans newest first, loaded a page at a time through canFetchMore/fetchMore
+    def __init__(self, user_id, search="", parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.search = search
+        self.plans = []
+        self.exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.plans)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        pid, pname, date = self.plans[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{pname} ({date})"
+        if role == Qt.ItemDataRole.UserRole:
+            return pid
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        last = self.plans[-1] if self.plans else (None, None, None)
+        page = get_plans_page(self.user_id, last[2], last[0], PLAN_PAGE_SIZE, self.search)
+        self.exhausted = len(page) < PLAN_PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.plans), len(self.plans) + len(page) - 1)
+            self.plans.extend(page)
+            self.endInsertRows()
+
+    def reload(self):
+        self.beginResetModel()
+        self.plans = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_search(self, search):
+        if search != self.search:
+            self.search = search
+            self.reload()
+
+    def add_plan(self, plan):
+        if not plan_matches_search(plan, self.search):
+            return
+        key = (plan[2], plan[0])
+        row = next((i for i, other in enumerate(self.plans) if (other[2], other[0]) < key), None)
+        if row is None:
+            if not self.exhausted:
+                return  # Sorts past the loaded pages; fetchMore will reach it
+            row = len(self.plans)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.plans.insert(row, plan)
+        self.endInsertRows()
+
+    def remove_plan(self, plan_id):
+        for row, plan in enumerate(self.plans):
+            if plan[0] == plan_id:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.plans[row]
+                self.endRemoveRows()
+                return
+
+class LazyChartTab(QWidget):
+    enlarged = pyqtSignal(object, object)
+
+    # Analytics tab: shows the cached image when current, otherwise draws the chart once
+    def __init__(self, make_chart, cache_key=None, revision=None, parent=None):
+        super().__init__(parent)
+        self.make_chart = make_chart
+        self.cache_key = cache_key
+        self.revision = revision
+        self.parent_widget = parent
+        self.shown_revision = None
+        self.series = None
+        self.chart = None
+        self.canvas = None
+        self.image_label = None
+        self.stored_key = None
+        self.tab_layout = QVBoxLayout(self)
+        self.tab_layout.setContentsMargins(0, 0, 0, 0)
+
+    def is_rendered(self):
+        return self.shown_revision is not None and self.shown_revision == self.revision
+
+    def set_series(self, series):
+        self.series = series
+        self.revision = series['revision']
+        if self.shown_revision is not None:
+            self.ensure_rendered()  # Already on screen once, so bring it up to date now
+
+    def ensure_rendered(self):
+        # Returns True if something new was put on screen
+        if self.is_rendered():
+            return False
+        if not self.isVisible() and self.parentWidget() is not None:
+            # Hidden pages aren't laid out yet; they will be shown at the size of the page stack
+            self.resize(self.parentWidget().size())
+        if self.canvas is None and self.cache_key and self.revision is not None:
+            pixmap = chart_cache.get((*self.cache_key, self.width(), self.height(), self.revision))
+            if pixmap is not None:
+                self.show_image(pixmap)
+                return True
+        if self.series is None:
+            return False
+        self.shown_revision = self.revision
+        try:
+            if self.chart is None:
+                self.chart = self.make_chart()
+            self.chart.update(self.series)
+        except Exception as e:
+            error_label = QLabel(f"Error loading analytics: {str(e)}")
+            error_label.setFont(QFont("Roboto", 16))
+            error_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.tab_layout.addWidget(error_label)
+            return True
+        if self.canvas is None:
+            if self.image_label is not None:
+                self.image_label.deleteLater()
+                self.image_label = None
+            self.canvas = make_chart_canvas(self.chart.figure, {}, self.chart.chart_type, self.parent_widget)
+            self.canvas.enlarged.connect(self.enlarged)
+            self.canvas.mpl_connect('draw_event', self.store_image)
+            self.tab_layout.addWidget(self.canvas)
+            # Size the canvas by hand so it renders (and is cached) while still hidden
+            self.canvas.resize(self.size())
+            self.canvas.draw_idle()
+        return True
+
+    def show_image(self, pixmap):
+        if self.image_label is None:
+            self.image_label = QLabel()
+            self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.tab_layout.addWidget(self.image_label)
+        self.image_label.setPixmap(pixmap)
+        self.shown_revision = self.revision
+
+    def store_image(self, event):
+        if not self.cache_key or self.shown_revision is None:
+            return
+        key = (*self.cache_key, self.canvas.width(), self.canvas.height(), self.shown_revision)
+        if key == self.stored_key:
+            return  # Hover and tooltip redraws don't change what is cached
+        buffer = self.canvas.buffer_rgba()
+        height, width = buffer.shape[:2]
+        image = QImage(bytes(buffer), width, height, width * 4, QImage.Format.Format_RGBA8888).copy()
+        image.setDevicePixelRatio(self.canvas.devicePixelRatioF())
+        chart_cache.put(key, QPixmap.fromImage(image))
+        self.stored_key = key
+
+    def mousePressEvent(self, event):
+        # A cached image has no figure behind it, so build one for the enlarged view
+        if self.image_label is not None and self.series is not None and event.button() == Qt.MouseButton.LeftButton:
+            if self.chart is None:
+                self.chart = self.make_chart()
+            self.chart.update(self.series)
+            self.enlarged.emit(self.chart.chart_type, self.chart.figure)
+        super().mousePressEvent(event)
+
 class MealPlannerApp(QMainWindow):
     def __init__(self):
         super().__init__()
+        start_gui_services()
         self.setWindowTitle("Healthyt")
         self.setGeometry(100, 100, 1400, 900)
         self.setMinimumSize(1400, 900)  # Enforce minimum size to prevent resizing
-        self.setStyleSheet(f"background: {PRIMARY_BG};")
+        apply_theme(QApplication.instance())
         self.user_id = None
         self.username = ""
         self.selected_plan_id = None
         self.is_signup = False
-        self.build_login_ui()
+        self.analytics_worker = None
+        self.analytics_status_label = None
+        self.import_worker = None
+        self.export_worker = None
+        self.credential_worker = None
+        self.current_screen = None
+        self.plan_model = None
+        write_results.failed.connect(self.show_write_error)
+        self.meal_tabs = None
+        self.meal_tab_map = {}
+        self.meal_table = None
+        self.meal_view_mode = None  # None picks tabs or the table by plan size
+        # Screens are built once; page_revisions says which went stale
+        self.screens = QStackedWidget()
+        self.setCentralWidget(self.screens)
+        self.pages = {}
+        self.page_revisions = {}
+        self.page_builders = {
+            "login": self.build_login_ui,
+            "home": self.build_home_ui,
+            "plans": self.build_main_ui,
+            "analytics": self.build_analytics_ui,
+            "settings": self.build_settings_ui,
+        }
+        self.connect_data_events()
+        self.show_screen("login")
+
+    def closeEvent(self, event):
+        self.cancel_analytics_worker()
+        write_queue.flush()  # Commit anything still queued before the window goes away
+        super().closeEvent(event)
+
+    def show_write_error(self, message):
+        QMessageBox.critical(self, "Error", f"Could not save changes: {message}")
+
+    def connect_data_events(self):
+        # Screens refresh only the parts a change touches, instead of reloading after every action
+        data_events.plan_created.connect(self.on_plan_created)
+        data_events.plan_deleted.connect(self.on_plan_deleted)
+        data_events.plans_cleared.connect(self.on_plans_cleared)
+        data_events.meals_imported.connect(self.on_bulk_change)
+        data_events.plans_generated.connect(self.on_bulk_change)
+        data_events.meal_saved.connect(self.on_meal_saved)
+        data_events.meal_updated.connect(self.on_meal_updated)
+        data_events.meal_deleted.connect(self.on_meal_deleted)
+        data_events.data_changed.connect(self.on_data_changed)
+
+    def on_plan_created(self, user_id, plan_id, revision):
+        if user_id == self.user_id and self.current_screen == "plans":
+            plan = get_plan(plan_id)
+            if plan:
+                self.plan_model.add_plan(plan)
+
+    def on_plan_deleted(self, user_id, plan_id, revision):
+        if user_id != self.user_id:
+            return
+        if plan_id == self.selected_plan_id:
+            self.selected_plan_id = None
+        if self.current_screen == "plans":
+            self.plan_model.remove_plan(plan_id)
+            if self.selected_plan_id is None:
+                self.update_meal_header()
+                self.clear_meals()
+
+    def on_plans_cleared(self, user_id, revision):
+        if user_id == self.user_id:
+            self.selected_plan_id = None
+            if self.current_screen == "plans":
+                self.load_plans()
+                self.update_meal_header()
+                self.clear_meals()
+
+    def on_bulk_change(self, user_id, revision):
+        if user_id == self.user_id and self.current_screen == "plans":
+            self.load_plans()
+            if self.selected_plan_id:
+                self.render_plan_meals()
+
+    def is_open_plan(self, user_id, plan_id):
+        return user_id == self.user_id and self.current_screen == "plans" and plan_id == self.selected_plan_id
+
+    def on_meal_saved(self, user_id, plan_id, meal_id, revision):
+        if not self.is_open_plan(user_id, plan_id):
+            return
+        meal = get_meal(meal_id)
+        if not meal:
+            return
+        if self.meal_table is not None:
+            self.meal_table.model.add_meal(meal)
+        elif self.meal_view_mode is None and len(self.meal_tab_map) >= MEAL_TABS_LIMIT:
+            self.render_plan_meals()
+        else:
+            self.add_meal_tab(meal)
+
+    def on_meal_updated(self, user_id, plan_id, meal_id, revision):
+        if self.is_open_plan(user_id, plan_id):
+            meal = get_meal(meal_id)
+            if meal and self.meal_table is not None:
+                self.meal_table.model.update_meal(meal)
+            elif meal:
+                self.update_meal_tab(meal)
+
+    def on_meal_deleted(self, user_id, plan_id, meal_id, revision):
+        if not self.is_open_plan(user_id, plan_id):
+            return
+        if self.meal_table is not None:
+            self.meal_table.model.remove_meal(meal_id)
+            if not self.meal_table.model.meals:
+                self.show_no_meals()
+        else:
+            self.remove_meal_tab(meal_id)
+
+    def on_data_changed(self, user_id, revision):
+        if user_id != self.user_id:
+            return
+        if self.current_screen == "plans":
+            # The plan events before this one have already brought the page up to date
+            self.page_revisions["plans"] = revision
+        elif self.current_screen in ("home", "analytics"):
+            self.refresh_screen(self.current_screen, revision)
+
+    def show_screen(self, name):
+        if self.current_screen == "analytics" and name != "analytics":
+            self.leave_analytics()
+        page = self.pages.get(name)
+        if page is None:
+            page = self.pages[name] = self.page_builders[name]()
+            self.screens.addWidget(page)
+        self.current_screen = name
+        self.screens.setCurrentWidget(page)
+        if name != "login":
+            revision = get_data_revision(self.user_id)
+            if self.page_revisions.get(name) != revision:
+                self.refresh_screen(name, revision)
+            elif name == "analytics":
+                self.analytics_prefetch_timer.start()
+
+    def refresh_screen(self, name, revision):
+        self.page_revisions[name] = revision
+        if name == "home":
+            self.refresh_home_page()
+        elif name == "plans":
+            self.refresh_plans_page()
+        elif name == "analytics":
+            self.update_analytics()
+
+    def refresh_home_page(self):
+        self.welcome_label.setText(f"Welcome {self.username}")
+        for label, value in zip(self.stat_labels, get_account_info(self.user_id)):
+            label.setText(str(value))
+
+    def refresh_plans_page(self):
+        self.load_plans()
+        if self.selected_plan_id and not get_plan(self.selected_plan_id):
+            self.selected_plan_id = None
+        self.update_meal_header()
+        if self.selected_plan_id:
+            self.render_plan_meals()
+        else:
+            self.clear_meals()
+
+    def leave_analytics(self):
+        # Charts stay on the page; a load that was still running is started again on return
+        self.analytics_prefetch_timer.stop()
+        if self.analytics_worker:
+            self.cancel_analytics_worker()
+            self.page_revisions.pop("analytics", None)
+
+    def rebuild_login_page(self):
+        page = self.pages.pop("login", None)
+        if page is not None:
+            self.screens.removeWidget(page)
+            page.deleteLater()
+        self.show_screen("login")
+
+    def logout(self):
+        self.rebuild_login_page()  # Also clears the credentials typed last time
+        # The session's pages hold the user's data, so the next login starts from fresh ones
+        for name in [name for name in self.pages if name != "login"]:
+            page = self.pages.pop(name)
+            self.screens.removeWidget(page)
+            page.deleteLater()
+        self.page_revisions.clear()
+        self.user_id = None
+        self.username = ""
+        self.selected_plan_id = None
+        self.plan_model = None
+        self.meal_tabs = None
+        self.meal_tab_map = {}
+        self.meal_table = None
 
     def build_login_ui(self):
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        main_layout = QHBoxLayout(self.central_widget)
+        page = QWidget()
+        main_layout = QHBoxLayout(page)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
         # Left decorative panel
         left_panel = QFrame()
         left_panel.setFixedWidth(600)
-        left_panel.setStyleSheet(f"""
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                      stop:0 #2E3147, stop:1 #00C4B4);
-            border-right: 1px solid {SUBTLE_BORDER_COLOR};
-        """)
+        left_panel.setObjectName("brandPanel")
         left_layout = QVBoxLayout(left_panel)
         left_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
         left_layout.setContentsMargins(50, 50, 50, 50)
 
         logo = QLabel("Healthyt")
         logo.setFont(QFont("Roboto", 48, QFont.Weight.Bold))
-        logo.setStyleSheet(f"color: {TEXT_COLOR}; text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.5); background: transparent;")
         logo.setAlignment(Qt.AlignmentFlag.AlignCenter)
         left_layout.addWidget(logo)
 
         slogan = QLabel("Your Nutrition, simplified")
         slogan.setFont(QFont("Roboto", 18))
-        slogan.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.8; background: transparent;")
         slogan.setAlignment(Qt.AlignmentFlag.AlignCenter)
         left_layout.addWidget(slogan)
 
@@ -474,19 +3011,13 @@ class MealPlannerApp(QMainWindow):
 
         # Right form panel
         right_panel = QFrame()
-        right_panel.setStyleSheet(f"background: {PRIMARY_BG};")
         right_layout = QVBoxLayout(right_panel)
         right_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
         right_layout.setContentsMargins(50, 50, 50, 50)
 
         # Dynamic form container
         self.form_container = QFrame()
-        self.form_container.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 15px;
-            padding: 30px;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-        """)
+        self.form_container.setObjectName("authForm")
         self.form_layout = QVBoxLayout(self.form_container)
         self.form_layout.setSpacing(20)
 
@@ -494,35 +3025,20 @@ class MealPlannerApp(QMainWindow):
             # Login Form
             title = QLabel("Welcome Back")
             title.setFont(QFont("Roboto", 28, QFont.Weight.Bold))
-            title.setStyleSheet(f"color: {TEXT_COLOR};")
             title.setAlignment(Qt.AlignmentFlag.AlignCenter)
             self.form_layout.addWidget(title)
 
             self.username_entry = QLineEdit()
             self.username_entry.setPlaceholderText("Username")
             self.username_entry.setFixedHeight(50)
-            self.username_entry.setStyleSheet(f"""
-                background-color: {SECONDARY_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px;
-                color: {TEXT_COLOR};
-                font-size: 14px;
-            """)
+            self.username_entry.setProperty("inputSize", "large")
             self.form_layout.addWidget(self.username_entry)
 
             self.password_entry = QLineEdit()
             self.password_entry.setPlaceholderText("Password")
             self.password_entry.setEchoMode(QLineEdit.EchoMode.Password)
             self.password_entry.setFixedHeight(50)
-            self.password_entry.setStyleSheet(f"""
-                background-color: {SECONDARY_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px;
-                color: {TEXT_COLOR};
-                font-size: 14px;
-            """)
+            self.password_entry.setProperty("inputSize", "large")
             self.form_layout.addWidget(self.password_entry)
 
             login_button = AnimatedButton("Sign In", button_type="primary")
@@ -536,35 +3052,20 @@ class MealPlannerApp(QMainWindow):
             # Signup Form
             title = QLabel("Create Account")
             title.setFont(QFont("Roboto", 28, QFont.Weight.Bold))
-            title.setStyleSheet(f"color: {TEXT_COLOR};")
             title.setAlignment(Qt.AlignmentFlag.AlignCenter)
             self.form_layout.addWidget(title)
 
             self.new_username_entry = QLineEdit()
             self.new_username_entry.setPlaceholderText("Username")
             self.new_username_entry.setFixedHeight(50)
-            self.new_username_entry.setStyleSheet(f"""
-                background-color: {SECONDARY_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px;
-                color: {TEXT_COLOR};
-                font-size: 14px;
-            """)
+            self.new_username_entry.setProperty("inputSize", "large")
             self.form_layout.addWidget(self.new_username_entry)
 
             self.new_password_entry = QLineEdit()
             self.new_password_entry.setPlaceholderText("Password")
             self.new_password_entry.setEchoMode(QLineEdit.EchoMode.Password)
             self.new_password_entry.setFixedHeight(50)
-            self.new_password_entry.setStyleSheet(f"""
-                background-color: {SECONDARY_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px;
-                color: {TEXT_COLOR};
-                font-size: 14px;
-            """)
+            self.new_password_entry.setProperty("inputSize", "large")
             self.form_layout.addWidget(self.new_password_entry)
 
             # Password suggestions
@@ -572,7 +3073,6 @@ class MealPlannerApp(QMainWindow):
                 "Password must be:\n- 8 characters minimum\n- Include a number\n- Include a special character\n- Include an uppercase letter"
             )
             password_hints.setFont(QFont("Roboto", 10))
-            password_hints.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.7;")
             password_hints.setAlignment(Qt.AlignmentFlag.AlignLeft)
             self.form_layout.addWidget(password_hints)
 
@@ -585,23 +3085,62 @@ class MealPlannerApp(QMainWindow):
             self.form_layout.addWidget(back_button)
 
         right_layout.addWidget(self.form_container)
+
+        # Shows that a password is being checked; kept outside the form, which is disabled meanwhile
+        self.auth_status_label = QLabel()
+        self.auth_status_label.setFont(QFont("Roboto", 12))
+        self.auth_status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.auth_status_label.setProperty("accent", "accent")
+        right_layout.addWidget(self.auth_status_label)
         right_layout.addStretch()
         main_layout.addWidget(right_panel)
+        return page
 
     def show_login_form(self):
         self.is_signup = False
-        self.build_login_ui()
+        self.rebuild_login_page()
 
     def show_signup_form(self):
         self.is_signup = True
-        self.build_login_ui()
+        self.rebuild_login_page()
+
+    def run_credential_task(self, widgets, status_label, message, fn, *args, callback=None):
+        # Password hashing is slow by design, so it runs on the pool with the form disabled
+        if self.credential_worker is not None:
+            return
+        for widget in widgets:
+            widget.setEnabled(False)
+        status_label.setText(message)
+
+        def done():
+            self.credential_worker = None
+            for widget in widgets:
+                widget.setEnabled(True)
+            status_label.clear()
+
+        def finished(result):
+            done()
+            callback(result)
+
+        def failed(error):
+            done()
+            QMessageBox.critical(self, "Error", error)
+
+        self.credential_worker = TaskWorker(call_task, fn, *args)
+        self.credential_worker.signals.result.connect(finished)
+        self.credential_worker.signals.error.connect(failed)
+        self.credential_worker.start()
 
     def handle_login(self):
-        user = login_user(self.username_entry.text(), self.password_entry.text())
+        self.run_credential_task([self.form_container], self.auth_status_label, "Verifying password...",
+                                 login_user, self.username_entry.text(), self.password_entry.text(),
+                                 callback=self.on_login_finished)
+
+    def on_login_finished(self, user):
         if user:
             self.user_id = user[0]
             self.username = user[1]
-            self.build_home_ui()
+            self.show_screen("home")
         else:
             QMessageBox.critical(self, "Login Failed", "Invalid credentials.")
 
@@ -611,7 +3150,11 @@ class MealPlannerApp(QMainWindow):
         if len(password) < 8 or not any(c.isdigit() for c in password) or not any(c.isupper() for c in password) or not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
             QMessageBox.critical(self, "Error", "Password must be 8 characters minimum and include a number, special character, and uppercase letter.")
             return
-        if register_user(username, password):
+        self.run_credential_task([self.form_container], self.auth_status_label, "Creating account...",
+                                 register_user, username, password, callback=self.on_registered)
+
+    def on_registered(self, ok):
+        if ok:
             QMessageBox.information(self, "Success", "Account created successfully.")
             self.show_login_form()
         else:
@@ -620,24 +3163,20 @@ class MealPlannerApp(QMainWindow):
     def build_header(self):
         header = QFrame()
         header.setFixedHeight(80)
-        header.setStyleSheet(f"""
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                                      stop:0 {PRIMARY_BG}, stop:1 {SECONDARY_BG});
-            border-bottom: 1px solid {BORDER_COLOR};
-        """)
+        header.setObjectName("appHeader")
         header_layout = QHBoxLayout(header)
         header_layout.setContentsMargins(20, 0, 20, 0)
         header_layout.setSpacing(15)
 
         logo = QLabel("Healthyt")
         logo.setFont(QFont("Roboto", 20, QFont.Weight.Bold))
-        logo.setStyleSheet(f"color: {PRIMARY_COLOR}; background: transparent;")
+        logo.setProperty("accent", "primary")
         header_layout.addWidget(logo)
 
         header_layout.addStretch()
 
         home_button = AnimatedButton("Home", button_type="secondary")
-        home_button.clicked.connect(self.build_home_ui)
+        home_button.clicked.connect(lambda: self.show_screen("home"))
         header_layout.addWidget(home_button)
 
         settings_button = AnimatedButton("Settings", button_type="secondary")
@@ -645,15 +3184,14 @@ class MealPlannerApp(QMainWindow):
         header_layout.addWidget(settings_button)
 
         logout_button = AnimatedButton("Logout", button_type="danger")
-        logout_button.clicked.connect(self.build_login_ui)
+        logout_button.clicked.connect(self.logout)
         header_layout.addWidget(logout_button)
 
         return header
 
     def build_home_ui(self):
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        main_layout = QVBoxLayout(self.central_widget)
+        page = QWidget()
+        main_layout = QVBoxLayout(page)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
@@ -664,34 +3202,25 @@ class MealPlannerApp(QMainWindow):
         # Content area with fixed height
         content_frame = QFrame()
         content_frame.setFixedHeight(620)  
-        content_frame.setStyleSheet(f"background: {PRIMARY_BG};")
         content_layout = QVBoxLayout(content_frame)
         content_layout.setContentsMargins(40, 40, 40, 40)  # Increased margins for less cramping
         content_layout.setSpacing(30)  # Increased spacing between elements
 
         hero_frame = QFrame()
-        hero_frame.setStyleSheet(f"""
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                      stop:0 {CARD_BG}, stop:1 {SECONDARY_BG});
-            border-radius: 16px;
-            border: 1px solid {BORDER_COLOR};  # Subtle border
-            padding: 30px;  # Increased padding for less cramping
-        """)
+        hero_frame.setObjectName("heroCard")
         hero_layout = QVBoxLayout(hero_frame)
         hero_layout.setSpacing(20)  # Increased spacing within hero
 
-        title = QLabel(f"Welcome {self.username}")
-        title.setFont(QFont("Roboto", 32, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR}; background: transparent; line-height: 1.5em;")
-        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        hero_layout.addWidget(title)
+        self.welcome_label = QLabel()
+        self.welcome_label.setFont(QFont("Roboto", 32, QFont.Weight.Bold))
+        self.welcome_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        hero_layout.addWidget(self.welcome_label)
 
         desc = QLabel(
             "Effortlessly plan your meals, track nutrition, and gain insights into your dietary habits. "
             "Create personalized meal plans with a sleek, modern interface designed for nutrition enthusiasts."
         )
         desc.setFont(QFont("Roboto", 16))
-        desc.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.8; background: transparent; line-height: 1.6em;")
         desc.setWordWrap(True)
         desc.setAlignment(Qt.AlignmentFlag.AlignCenter)
         hero_layout.addWidget(desc)
@@ -699,71 +3228,57 @@ class MealPlannerApp(QMainWindow):
         content_layout.addWidget(hero_frame)
 
         stats_frame = QFrame()
-        stats_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 12px;
-            border: 1px solid {SUBTLE_BORDER_COLOR};  # Subtle border
-            padding: 25px;  # Increased padding
-        """)
+        stats_frame.setProperty("frameRole", "section")
         stats_layout = QHBoxLayout(stats_frame)
         stats_layout.setContentsMargins(20, 20, 20, 20)  # Increased internal margins
         stats_layout.setSpacing(40)  # Increased spacing between stat cards
 
-        plan_count, meal_count = get_account_info(self.user_id)
+        # Filled in by refresh_home_page when the page is shown
+        self.stat_labels = []
         stats_data = [
-            ("Meal Plans", plan_count, ACCENT_COLOR),
-            ("Total Meals", meal_count, SUCCESS_COLOR)
+            ("Meal Plans", "accent"),
+            ("Total Meals", "success")
         ]
 
-        for label_text, value, color in stats_data:
+        for label_text, accent in stats_data:
             stat_card = QFrame()
-            stat_card.setStyleSheet(f"""
-                background: {SECONDARY_BG};
-                border-radius: 8px;
-                border: 1px solid {SUBTLE_BORDER_COLOR};  # Subtle border
-                padding: 20px;  # Increased padding
-            """)
+            stat_card.setProperty("frameRole", "panel")
             stat_layout = QVBoxLayout(stat_card)
             stat_layout.setSpacing(15)  # Increased spacing within card
             stat_label = QLabel(label_text)
             stat_label.setFont(QFont("Roboto", 14))
-            stat_label.setStyleSheet(f"color: {TEXT_COLOR}; background: transparent;")
             stat_layout.addWidget(stat_label)
-            value_label = QLabel(str(value))
+            value_label = QLabel()
             value_label.setFont(QFont("Roboto", 24, QFont.Weight.Bold))
-            value_label.setStyleSheet(f"color: {color}; background: transparent; line-height: 1.5em;")
+            value_label.setProperty("accent", accent)
             stat_layout.addWidget(value_label)
+            self.stat_labels.append(value_label)
             stats_layout.addWidget(stat_card)
 
         content_layout.addWidget(stats_frame)
 
         actions_frame = QFrame()
-        actions_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 12px;
-            border: 1px solid {SUBTLE_BORDER_COLOR};  # Subtle border
-            padding: 25px;  # Increased padding
-        """)
+        actions_frame.setProperty("frameRole", "section")
         actions_layout = QHBoxLayout(actions_frame)
         actions_layout.setContentsMargins(20, 20, 20, 20)  # Increased internal margins
         actions_layout.setSpacing(30)  # Increased spacing between buttons
 
         view_plans_button = AnimatedButton("Manage Plans", button_type="primary")
-        view_plans_button.clicked.connect(self.build_main_ui)
+        view_plans_button.clicked.connect(lambda: self.show_screen("plans"))
         actions_layout.addWidget(view_plans_button)
 
         analytics_button = AnimatedButton("Nutrition Insights", button_type="primary")
-        analytics_button.clicked.connect(self.build_analytics_ui)
+        analytics_button.clicked.connect(lambda: self.show_screen("analytics"))
         actions_layout.addWidget(analytics_button)
 
         content_layout.addWidget(actions_frame)
 
         main_layout.addWidget(content_frame)
+        return page
 
     def build_analytics_ui(self):
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        main_layout = QVBoxLayout(self.central_widget)
+        page = QWidget()
+        main_layout = QVBoxLayout(page)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
@@ -774,234 +3289,120 @@ class MealPlannerApp(QMainWindow):
         # Content area with fixed height
         content_frame = QFrame()
         content_frame.setFixedHeight(620)  
-        content_frame.setStyleSheet(f"background: {PRIMARY_BG};")
         content_layout = QVBoxLayout(content_frame)
         content_layout.setContentsMargins(30, 30, 30, 30)
         content_layout.setSpacing(20)
 
         title = QLabel("Nutrition Insights")
         title.setFont(QFont("Roboto", 28, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR}; background: transparent;")
         content_layout.addWidget(title)
 
         self.analytics_tab_widget = QTabWidget()
-        self.analytics_tab_widget.setStyleSheet(f"""
-            QTabWidget::pane {{
-                background: {CARD_BG};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 12px;
-                padding: 10px 10px 0 10px; /* Added top padding for gap */
-            }}
-            QTabBar {{
-                alignment: center;
-            }}
-            QTabBar::tab {{
-                background: {SECONDARY_BG};
-                color: {TEXT_COLOR};
-                border: 1px solid {BORDER_COLOR};
-                border-radius: 8px;
-                padding: 12px 20px;
-                margin-right: 10px;
-                margin-left: 10px;
-                font-weight: 500;
-                box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-            }}
-            QTabBar::tab:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                          stop:0 {PRIMARY_COLOR}, stop:1 {PRIMARY_COLOR}80);
-                border: 1px solid {PRIMARY_COLOR};
-            }}
-            QTabBar::tab:selected {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1, 
-                                          stop:0 {PRIMARY_COLOR}, stop:1 {PRIMARY_COLOR}60);
-                color: {TEXT_COLOR};
-                border: 1px solid {PRIMARY_COLOR};
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-            }}
-        """)
+        self.analytics_tab_widget.setObjectName("analyticsTabs")
         self.analytics_tab_widget.setMinimumSize(1200, 500)
+        self.analytics_tab_widget.currentChanged.connect(self.render_analytics_tab)
         content_layout.addWidget(self.analytics_tab_widget)
 
-        self.update_analytics()
+        # Parented to the tab widget so it goes away with the page at logout
+        self.analytics_prefetch_timer = QTimer(self.analytics_tab_widget)
+        self.analytics_prefetch_timer.setInterval(0)
+        self.analytics_prefetch_timer.timeout.connect(self.prefetch_analytics_tab)
+
         main_layout.addWidget(content_frame)
+        return page
 
     def update_analytics(self):
-        try:
-            with get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT mp.id, mp.plan_name, mp.date, m.id, m.meal_name, m.meal_type, 
-                           m.calories, m.protein, m.carbs, m.fats, m.preparation_time, m.category
-                    FROM meal_plans mp
-                    LEFT JOIN meals m ON mp.id = m.plan_id AND m.user_id = ?
-                    WHERE mp.user_id = ?
-                """, (self.user_id, self.user_id))
-                all_meals = cursor.fetchall()
-
-            if not all_meals:
-                no_data_label = QLabel("No meal plan or meal data available.")
-                no_data_label.setFont(QFont("Roboto", 16))
-                no_data_label.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.8;")
-                no_data_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.analytics_tab_widget.clear()
-                self.analytics_tab_widget.addTab(no_data_label, "No Data")
-                return
+        # The queries and aggregation run on a worker; the tabs are filled in when it reports back
+        self.cancel_analytics_worker()
+        if not isinstance(self.analytics_tab_widget.widget(0), LazyChartTab):
+            # Charts stay up while reloading; cached images show at once if these exact charts were drawn
+            revision = get_data_revision(self.user_id)
+            if chart_cache.has_revision(('user', self.user_id, chart_slug(ANALYTICS_CHARTS[0][0])), revision):
+                self.add_chart_tabs(revision)
+                self.analytics_prefetch_timer.start()
+            else:
+                self.analytics_status_label = self.show_analytics_message("Loading nutrition insights...", "Loading")
+        worker = TaskWorker(get_analytics_summary, self.user_id)
+        worker.signals.progress.connect(self.on_analytics_progress)
+        worker.signals.result.connect(self.on_analytics_loaded)
+        worker.signals.error.connect(self.on_analytics_error)
+        self.analytics_worker = worker
+        worker.start()
+
+    def cancel_analytics_worker(self):
+        if self.analytics_worker:
+            self.analytics_worker.cancel()
+            self.analytics_worker = None
+
+    def is_current_analytics_worker(self):
+        worker = self.analytics_worker
+        return worker is not None and self.sender() is worker.signals and not worker.is_cancelled
+
+    def show_analytics_message(self, text, tab_title):
+        message_label = QLabel(text)
+        message_label.setFont(QFont("Roboto", 16))
+        message_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        clear_tabs(self.analytics_tab_widget)
+        self.analytics_tab_widget.addTab(message_label, tab_title)
+        return message_label
+
+    def on_analytics_progress(self, done, total):
+        if self.is_current_analytics_worker() and self.analytics_status_label:
+            self.analytics_status_label.setText(f"Loading nutrition insights... {done * 100 // total}%")
+
+    def on_analytics_error(self, message):
+        if self.is_current_analytics_worker():
+            self.analytics_worker = None
+            self.analytics_status_label = None
+            self.show_analytics_message(f"Error loading analytics: {message}", "Error")
+
+    def on_analytics_loaded(self, series):
+        if not self.is_current_analytics_worker():
+            return
+        self.analytics_worker = None
+        self.analytics_status_label = None
 
-            plan_data = {}
-            for meal in all_meals:
-                plan_id, plan_name, date, mid, mname, mtype, cal, pro, carb, fat, prep, cat = meal
-                if plan_id and mid:
-                    if plan_id not in plan_data:
-                        plan_data[plan_id] = {'name': plan_name, 'date': date, 'meals': []}
-                    plan_data[plan_id]['meals'].append((mid, mname, mtype, cal, pro, carb, fat, prep, cat))
-
-            if plan_data:
-                # 1. Macronutrient Distribution Pie Chart
-                fig1, ax1 = plt.subplots(figsize=(12, 9))
-                macro_counts = {'Protein': 0, 'Carbs': 0, 'Fats': 0}
-                for plan_id, data in plan_data.items():
-                    for _, _, _, _, pro, carb, fat, _, _ in data['meals']:
-                        macro_counts['Protein'] += pro
-                        macro_counts['Carbs'] += carb
-                        macro_counts['Fats'] += fat
-                total = sum(macro_counts.values())
-                if total > 0:
-                    labels = list(macro_counts.keys())
-                    sizes = [v/total*100 for v in macro_counts.values()]
-                    ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90,
-                           textprops={'fontsize': 14, 'color': TEXT_COLOR},
-                           colors=CHART_COLORS[:3])
-                    ax1.axis('equal')
-                    ax1.set_title("Macronutrient Distribution", color=TEXT_COLOR, fontsize=16)
-                    fig1.patch.set_facecolor(CARD_BG)
-
-                # 2. Calories by Meal Type Bar Chart
-                fig2, ax2 = plt.subplots(figsize=(12, 9))
-                meal_types = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
-                calories = {t: 0 for t in meal_types}
-                counts = {t: 0 for t in meal_types}
-                for plan_id, data in plan_data.items():
-                    for _, _, mtype, cal, _, _, _, _, _ in data['meals']:
-                        if mtype in meal_types:
-                            calories[mtype] += cal
-                            counts[mtype] += 1
-                avg_calories = [calories[t]/counts[t] if counts[t] > 0 else 0 for t in meal_types]
-                if any(avg_calories):
-                    bars = ax2.bar(meal_types, avg_calories, color=CHART_COLORS[0], edgecolor=BORDER_COLOR)
-                    meals_data = {bar: [(0, mtype, f"{calories[mtype]/counts[mtype]:.1f} kcal")] for bar, mtype in zip(bars, meal_types) if counts[mtype] > 0}
-                    ax2.set_ylabel('Average Calories (kcal)', color=TEXT_COLOR, fontsize=14)
-                    ax2.set_title('Average Calories by Meal Type', color=TEXT_COLOR, fontsize=16)
-                    ax2.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
-                    ax2.tick_params(colors=TEXT_COLOR, labelsize=12)
-
-                # 3. Daily Calorie Trend Line Chart
-                fig3, ax3 = plt.subplots(figsize=(12, 9))
-                dates = sorted(set(data['date'] for data in plan_data.values()))
-                daily_calories = []
-                for date in dates:
-                    total_cal = sum(
-                        m[3] for pid, data in plan_data.items() 
-                        if data['date'] == date for m in data['meals']
-                    )
-                    daily_calories.append(total_cal)
-                if daily_calories:
-                    ax3.plot(dates, daily_calories, marker='o', color=CHART_COLORS[1])
-                    ax3.set_xlabel('Date', color=TEXT_COLOR, fontsize=14)
-                    ax3.set_ylabel('Total Calories (kcal)', color=TEXT_COLOR, fontsize=14)
-                    ax3.set_title('Daily Calorie Trend', color=TEXT_COLOR, fontsize=16)
-                    ax3.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
-                    ax3.tick_params(axis='x', rotation=45, colors=TEXT_COLOR, labelsize=12)
-                    ax3.tick_params(axis='y', colors=TEXT_COLOR, labelsize=12)
-
-                # 4. Preparation Time by Meal Type Bar Chart
-                fig4, ax4 = plt.subplots(figsize=(12, 9))
-                prep_times = {t: 0 for t in meal_types}
-                prep_counts = {t: 0 for t in meal_types}
-                for plan_id, data in plan_data.items():
-                    for _, _, mtype, _, _, _, _, prep, _ in data['meals']:
-                        if mtype in meal_types:
-                            prep_times[mtype] += prep
-                            prep_counts[mtype] += 1
-                avg_prep = [prep_times[t]/prep_counts[t] if prep_counts[t] > 0 else 0 for t in meal_types]
-                if any(avg_prep):
-                    bars = ax4.bar(meal_types, avg_prep, color=CHART_COLORS[2], edgecolor=BORDER_COLOR)
-                    meals_data = {bar: [(0, mtype, f"{prep_times[mtype]/prep_counts[mtype]:.1f} min")] for bar, mtype in zip(bars, meal_types) if prep_counts[mtype] > 0}
-                    ax4.set_ylabel('Average Prep Time (min)', color=TEXT_COLOR, fontsize=14)
-                    ax4.set_title('Average Prep Time by Meal Type', color=TEXT_COLOR, fontsize=16)
-                    ax4.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
-                    ax4.tick_params(colors=TEXT_COLOR, labelsize=12)
-
-                # 5. Meal Category Distribution Pie Chart
-                fig5, ax5 = plt.subplots(figsize=(12, 9))
-                category_counts = {}
-                for plan_id, data in plan_data.items():
-                    for _, _, _, _, _, _, _, _, cat in data['meals']:
-                        category_counts[cat] = category_counts.get(cat, 0) + 1
-                if category_counts:
-                    labels = list(category_counts.keys())
-                    sizes = list(category_counts.values())
-                    wedges, _, _ = ax5.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90,
-                                          textprops={'fontsize': 14, 'color': TEXT_COLOR},
-                                          colors=CHART_COLORS[:len(labels)])
-                    meals_data = {wedge: [(0, cat, f"{count} meals")] for wedge, cat, count in zip(wedges, labels, sizes)}
-                    ax5.axis('equal')
-                    ax5.set_title("Meal Category Distribution", color=TEXT_COLOR, fontsize=16)
-
-                # 6. Protein Intake by Meal Type and Category Stacked Bar Chart
-                fig6, ax6 = plt.subplots(figsize=(12, 9))
-                meal_types = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
-                categories = sorted(set(cat for data in plan_data.values() for _, _, _, _, _, _, _, _, cat in data['meals']))
-                protein_data = {cat: [0] * len(meal_types) for cat in categories}
-                counts = {cat: [0] * len(meal_types) for cat in categories}
-                for plan_id, data in plan_data.items():
-                    for _, _, mtype, _, pro, _, _, _, cat in data['meals']:
-                        if mtype in meal_types:
-                            idx = meal_types.index(mtype)
-                            protein_data[cat][idx] += pro
-                            counts[cat][idx] += 1
-                bottom = np.zeros(len(meal_types))
-                if any(sum(protein_data[cat]) > 0 for cat in categories):
-                    for cat in categories:
-                        avg_protein = [protein_data[cat][i]/counts[cat][i] if counts[cat][i] > 0 else 0 for i in range(len(meal_types))]
-                        ax6.bar(meal_types, avg_protein, bottom=bottom, label=cat, color=CHART_COLORS[categories.index(cat) % len(CHART_COLORS)])
-                        bottom += np.array(avg_protein)
-                    ax6.set_ylabel('Average Protein (g)', color=TEXT_COLOR, fontsize=14)
-                    ax6.set_title('Average Protein by Meal Type and Category', color=TEXT_COLOR, fontsize=16)
-                    ax6.legend(fontsize=12, loc='upper right', facecolor=CARD_BG, edgecolor=BORDER_COLOR, labelcolor=TEXT_COLOR)
-                    ax6.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
-                    ax6.tick_params(colors=TEXT_COLOR, labelsize=12)
-
-                # Add tabs with enlarged visualizations
-                self.analytics_tab_widget.clear()
-                self.analytics_tab_widget.addTab(FigureCanvas(fig1, {}, 'pie', self), "Macronutrient Distribution")
-                self.analytics_tab_widget.addTab(FigureCanvas(fig2, {}, 'bar', self), "Calories by Meal Type")
-                self.analytics_tab_widget.addTab(FigureCanvas(fig3, {}, 'line', self), "Daily Calorie Trend")
-                self.analytics_tab_widget.addTab(FigureCanvas(fig4, {}, 'bar', self), "Prep Time by Meal Type")
-                self.analytics_tab_widget.addTab(FigureCanvas(fig5, {}, 'pie', self), "Meal Category Distribution")
-                self.analytics_tab_widget.addTab(FigureCanvas(fig6, {}, 'bar', self), "Protein by Meal Type and Category")
-
-                # Set initial size and style for all canvases
-                for i in range(self.analytics_tab_widget.count()):
-                    canvas = self.analytics_tab_widget.widget(i)
-                    canvas.figure.patch.set_facecolor(CARD_BG)
-                    canvas.setStyleSheet(f"background: {CARD_BG};")
-                    canvas.enlarged.connect(self.enlarge_visualization)
+        if not series['meal_count']:
+            self.show_analytics_message("No meal plan or meal data available.", "No Data")
+            return
 
-        except Exception as e:
-            error_label = QLabel(f"Error loading analytics: {str(e)}")
-            error_label.setFont(QFont("Roboto", 16))
-            error_label.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.8;")
-            error_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.analytics_tab_widget.clear()
-            self.analytics_tab_widget.addTab(error_label, "Error")
+        if not isinstance(self.analytics_tab_widget.widget(0), LazyChartTab):
+            self.add_chart_tabs(series['revision'])
+        # Charts that already exist update in place rather than being rebuilt
+        for i in range(self.analytics_tab_widget.count()):
+            self.analytics_tab_widget.widget(i).set_series(series)
+        self.analytics_prefetch_timer.start()
+
+    def add_chart_tabs(self, revision):
+        # Tabs start as placeholders; the prefetch timer draws the visible one first
+        clear_tabs(self.analytics_tab_widget)
+        for title, make_chart in ANALYTICS_CHARTS:
+            tab = LazyChartTab(make_chart, ('user', self.user_id, chart_slug(title)), revision, self)
+            tab.enlarged.connect(self.enlarge_visualization)
+            self.analytics_tab_widget.addTab(tab, title)
+
+    def render_analytics_tab(self, index):
+        tab = self.analytics_tab_widget.widget(index)
+        if isinstance(tab, LazyChartTab):
+            tab.ensure_rendered()
+
+    def prefetch_analytics_tab(self):
+        # Runs when the event loop is idle, drawing one chart per tick, the visible one first
+        current = self.analytics_tab_widget.currentIndex()
+        order = [current] + [i for i in range(self.analytics_tab_widget.count()) if i != current]
+        for i in order:
+            tab = self.analytics_tab_widget.widget(i)
+            if isinstance(tab, LazyChartTab) and not tab.is_rendered() and tab.ensure_rendered():
+                return
+        self.analytics_prefetch_timer.stop()
 
     def enlarge_visualization(self, chart_type, figure):
         dialog = QDialog(self)
         dialog.setWindowTitle(f"Enlarged {chart_type.capitalize()} View")
-        dialog.setStyleSheet(f"background: {PRIMARY_BG};")
         layout = QVBoxLayout(dialog)
         dialog.setMinimumSize(1200, 900)
 
+        figure = copy_figure(figure)  # Leave the chart in the tab untouched
         figure.set_size_inches(15, 11)
         ax = figure.gca()
         ax.set_title(f"Enlarged {chart_type.capitalize()} View", fontsize=20, color=TEXT_COLOR)
@@ -1010,7 +3411,7 @@ class MealPlannerApp(QMainWindow):
             ax.get_legend().set_labelcolor(TEXT_COLOR)
         figure.patch.set_facecolor(CARD_BG)
 
-        canvas = FigureCanvas(figure, {}, chart_type, self)
+        canvas = make_chart_canvas(figure, {}, chart_type, self)
         layout.addWidget(canvas)
         canvas.draw()
 
@@ -1019,11 +3420,11 @@ class MealPlannerApp(QMainWindow):
         layout.addWidget(close_button)
 
         dialog.exec()
+        dialog.deleteLater()  # Frees the enlarged copy of the figure with its canvas
 
     def build_main_ui(self):
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        main_layout = QVBoxLayout(self.central_widget)
+        page = QWidget()
+        main_layout = QVBoxLayout(page)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
@@ -1034,7 +3435,6 @@ class MealPlannerApp(QMainWindow):
         # Content area with fixed height
         content_frame = QFrame()
         content_frame.setFixedHeight(620)  
-        content_frame.setStyleSheet(f"background: {PRIMARY_BG};")
         content_layout = QHBoxLayout(content_frame)
         content_layout.setContentsMargins(20, 20, 20, 20)
         content_layout.setSpacing(20)
@@ -1042,58 +3442,44 @@ class MealPlannerApp(QMainWindow):
         # Sidebar for Plans
         sidebar = QFrame()
         sidebar.setMinimumWidth(350)
-        sidebar.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 16px;
-            border: 1px solid {BORDER_COLOR};
-        """)
+        sidebar.setProperty("frameRole", "card")
         sidebar_layout = QVBoxLayout(sidebar)
         sidebar_layout.setContentsMargins(20, 20, 20, 20)
         sidebar_layout.setSpacing(15)
 
         plans_label = QLabel("Meal Plans")
         plans_label.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
-        plans_label.setStyleSheet(f"color: {TEXT_COLOR};")
         sidebar_layout.addWidget(plans_label)
 
-        self.plan_list = QScrollArea()
-        self.plan_list.setWidgetResizable(True)
-        self.plan_list_content = QWidget()
-        self.plan_list_layout = QVBoxLayout(self.plan_list_content)
-        self.plan_list_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.plan_list_layout.setSpacing(10)
-        self.plan_list.setStyleSheet(f"""
-            QScrollArea {{
-                background: transparent;
-                border: none;
-            }}
-            QWidget {{
-                background: transparent;
-            }}
-        """)
-        self.plan_list.setWidget(self.plan_list_content)
+        self.plan_search_entry = QLineEdit()
+        self.plan_search_entry.setPlaceholderText("Search plans (name, 2025-03, 2025-01..2025-03)")
+        sidebar_layout.addWidget(self.plan_search_entry)
+
+        # Rows load a page at a time as the list scrolls; the search is debounced
+        self.plan_model = PlanListModel(self.user_id, parent=page)
+        self.plan_search_timer = QTimer(self.plan_search_entry)
+        self.plan_search_timer.setSingleShot(True)
+        self.plan_search_timer.setInterval(250)
+        self.plan_search_timer.timeout.connect(lambda: self.plan_model.set_search(self.plan_search_entry.text()))
+        self.plan_search_entry.textChanged.connect(self.plan_search_timer.start)
+
+        self.plan_list = QListView()
+        self.plan_list.setModel(self.plan_model)
+        self.plan_list.setUniformItemSizes(True)
+        self.plan_list.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.plan_list.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.plan_list.clicked.connect(lambda index: self.open_plan(index.data(Qt.ItemDataRole.UserRole)))
+        self.plan_list.setObjectName("planList")
         sidebar_layout.addWidget(self.plan_list)
 
         plan_form_frame = QFrame()
-        plan_form_frame.setStyleSheet(f"""
-            background: {SECONDARY_BG};
-            border-radius: 8px;
-            border: 1px solid {BORDER_COLOR};
-            padding: 10px;
-        """)
+        plan_form_frame.setProperty("frameRole", "panel")
         plan_form_layout = QVBoxLayout(plan_form_frame)
         plan_form_layout.setSpacing(10)
 
         self.plan_entry = QLineEdit()
         self.plan_entry.setPlaceholderText("New Plan Name (e.g., Weekly Plan)")
         self.plan_entry.setFixedHeight(45)
-        self.plan_entry.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         plan_form_layout.addWidget(self.plan_entry)
 
         self.date_edit = QDateEdit()
@@ -1101,14 +3487,6 @@ class MealPlannerApp(QMainWindow):
         self.date_edit.setDisplayFormat("yyyy-MM-dd")
         self.date_edit.setMinimumHeight(45)
         self.date_edit.setDate(QDate.currentDate())
-        self.date_edit.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-            font-size: 12px;
-        """)
         plan_form_layout.addWidget(self.date_edit)
 
         create_plan_button = AnimatedButton("Create Plan", button_type="primary")
@@ -1121,16 +3499,25 @@ class MealPlannerApp(QMainWindow):
         delete_plan_button.clicked.connect(self.delete_selected_plan)
         sidebar_layout.addWidget(delete_plan_button)
 
+        transfer_layout = QHBoxLayout()
+        import_button = AnimatedButton("Import Meals", button_type="secondary")
+        import_button.clicked.connect(self.import_meals_ui)
+        transfer_layout.addWidget(import_button)
+        export_button = AnimatedButton("Export Meals", button_type="secondary")
+        export_button.clicked.connect(self.export_meals_ui)
+        transfer_layout.addWidget(export_button)
+        sidebar_layout.addLayout(transfer_layout)
+
+        repeat_button = AnimatedButton("Repeat Plans...", button_type="secondary")
+        repeat_button.clicked.connect(self.open_repeat_plans_dialog)
+        sidebar_layout.addWidget(repeat_button)
+
         sidebar_layout.addStretch()
         content_layout.addWidget(sidebar)
 
         # Main Content Area
         self.main_frame = QFrame()
-        self.main_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 16px;
-            border: 1px solid {BORDER_COLOR};
-        """)
+        self.main_frame.setProperty("frameRole", "card")
         self.main_layout = QVBoxLayout(self.main_frame)
         self.main_layout.setContentsMargins(20, 20, 20, 20)
         self.main_layout.setSpacing(15)
@@ -1139,18 +3526,13 @@ class MealPlannerApp(QMainWindow):
         # Locked meal planning header
         self.meal_header_frame = QFrame()
         self.meal_header_frame.setFixedHeight(80)  # Locked height
-        self.meal_header_frame.setStyleSheet(f"""
-            background: {SECONDARY_BG};
-            border-radius: 12px;
-            border: 1px solid {BORDER_COLOR};
-        """)
+        self.meal_header_frame.setProperty("frameRole", "panel")
         header_layout = QHBoxLayout(self.meal_header_frame)
         header_layout.setContentsMargins(15, 15, 15, 15)
         header_layout.setSpacing(15)
 
         self.plan_title_label = QLabel("No Plan Selected")
         self.plan_title_label.setFont(QFont("Roboto", 20, QFont.Weight.Bold))
-        self.plan_title_label.setStyleSheet(f"color: {TEXT_COLOR};")
         header_layout.addWidget(self.plan_title_label)
 
         # Add button bar only if a plan is selected
@@ -1163,6 +3545,12 @@ class MealPlannerApp(QMainWindow):
             add_button = AnimatedButton("Add Meal", button_type="primary")
             add_button.clicked.connect(self.open_meal_creator)
             button_bar_layout.addWidget(add_button)
+            view_button = AnimatedButton("Switch View", button_type="secondary")
+            view_button.clicked.connect(self.toggle_meal_view)
+            button_bar_layout.addWidget(view_button)
+            duplicate_button = AnimatedButton("Duplicate Plan", button_type="secondary")
+            duplicate_button.clicked.connect(self.open_duplicate_plan_dialog)
+            button_bar_layout.addWidget(duplicate_button)
             button_bar_layout.addStretch()  # Push button to the right
             header_layout.addWidget(button_bar)
 
@@ -1171,32 +3559,25 @@ class MealPlannerApp(QMainWindow):
         # Scrollable meals section with tabs
         self.meals_scroll = QScrollArea()
         self.meals_scroll.setWidgetResizable(True)
-        self.meals_scroll.setStyleSheet(f"""
-            QScrollArea {{
-                background: transparent;
-                border: none;
-            }}
-            QWidget {{
-                background: transparent;
-            }}
-        """)
+        self.meals_scroll.setObjectName("mealsScroll")
         self.meals_content = QWidget()
-        self.meals_content.setStyleSheet(f"background: {CARD_BG};")
+        self.meals_content.setObjectName("mealsContent")  # setWidget() turns on autoFillBackground
         self.meals_layout = QVBoxLayout(self.meals_content)
         self.meals_layout.setContentsMargins(0, 0, 0, 0)
         self.meals_layout.setSpacing(0)
+        self.meal_tabs = None
+        self.meal_tab_map = {}
+        self.meal_table = None
         self.meals_scroll.setWidget(self.meals_content)
         self.main_layout.addWidget(self.meals_scroll, stretch=1)
 
         content_layout.addWidget(self.main_frame, stretch=1)
         main_layout.addWidget(content_frame)
-
-        self.load_plans()
+        return page
 
     def build_settings_ui(self):
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        main_layout = QVBoxLayout(self.central_widget)
+        page = QWidget()
+        main_layout = QVBoxLayout(page)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
@@ -1207,24 +3588,18 @@ class MealPlannerApp(QMainWindow):
         # Content area with fixed height
         content_frame = QFrame()
         content_frame.setFixedHeight(620)  
-        content_frame.setStyleSheet(f"background: {PRIMARY_BG};")
         content_layout = QVBoxLayout(content_frame)
         content_layout.setContentsMargins(30, 30, 30, 30)
         content_layout.setSpacing(20)
 
         settings_frame = QFrame()
-        settings_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 16px;
-            border: 1px solid {BORDER_COLOR};
-        """)
+        settings_frame.setProperty("frameRole", "card")
         settings_layout = QVBoxLayout(settings_frame)
         settings_layout.setContentsMargins(20, 20, 20, 20)
         settings_layout.setSpacing(15)
 
         title = QLabel("Account Settings")
         title.setFont(QFont("Roboto", 20, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR};")
         settings_layout.addWidget(title)
 
         settings_buttons = [
@@ -1243,45 +3618,194 @@ class MealPlannerApp(QMainWindow):
         content_layout.addWidget(settings_frame)
 
         main_layout.addWidget(content_frame)
+        return page
 
     def create_plan_ui(self):
         name = self.plan_entry.text().strip()
         date = self.date_edit.date().toString("yyyy-MM-dd")
         if name:
-            create_meal_plan(self.user_id, name, date)
+            write_behind(create_meal_plan, self.user_id, name, date)  # The sidebar picks it up from plan_created
             self.plan_entry.clear()
             self.date_edit.setDate(QDate.currentDate())
-            self.load_plans()
 
     def delete_selected_plan(self):
         if self.selected_plan_id:
             if QMessageBox.question(self, "Confirm", 
                                   f"Are you sure you want to delete the plan '{self.get_plan_name(self.selected_plan_id)}'? This action cannot be undone.",
                                   QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
-                delete_meal_plan(self.selected_plan_id)
-                self.selected_plan_id = None
-                self.load_plans()
-                self.update_meal_header()
-                self.clear_meals()
-                QMessageBox.information(self, "Success", "Meal plan deleted successfully.")
+                write_behind(delete_meal_plan, self.selected_plan_id, callback=self.on_selected_plan_deleted)
+
+    def on_selected_plan_deleted(self, result):
+        QMessageBox.information(self, "Success", "Meal plan deleted successfully.")
 
     def get_plan_name(self, plan_id):
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT plan_name FROM meal_plans WHERE id=?", (plan_id,))
-            result = cursor.fetchone()
-            return result[0] if result else "Unknown Plan"
+        plan = get_plan(plan_id)
+        return plan[1] if plan else "Unknown Plan"
 
     def load_plans(self):
-        for i in reversed(range(self.plan_list_layout.count())):
-            self.plan_list_layout.itemAt(i).widget().deleteLater()
-        plans = get_plans_for_user(self.user_id)
-        for pid, pname, date in plans:
-            button = AnimatedButton(f"{pname} ({date})", button_type="secondary")
-            button.clicked.connect(lambda checked, id=pid: self.open_plan(id))
-            self.plan_list_layout.addWidget(button)
+        self.plan_model.reload()
+
+    def import_meals_ui(self):
+        if self.import_worker is not None:
+            QMessageBox.information(self, "Import", "An import is already running.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Meals", "",
+                                              "Meal files (*.csv *.jsonl *.ndjson *.csv.gz *.jsonl.gz);;All files (*)")
+        if not path:
+            return
+        # Runs off the GUI thread; the sidebar and open plan refresh from the meals_imported event
+        self.import_worker = TaskWorker(import_meals, self.user_id, path)
+        self.import_worker.signals.result.connect(self.on_import_finished)
+        self.import_worker.signals.error.connect(self.on_import_failed)
+        self.import_worker.start()
+
+    def on_import_finished(self, report):
+        self.import_worker = None
+        message = (f"Imported {report['imported']} of {report['rows']} rows into "
+                   f"{report['plans_created']} new plan(s) in {report['seconds']:.1f}s "
+                   f"({report['rows_per_second']:.0f} rows/s).")
+        if report['error_count']:
+            lines = "\n".join(f"Line {line}: {error}" for line, error in report['errors'][:10])
+            more = report['error_count'] - min(10, len(report['errors']))
+            message += f"\n\n{report['error_count']} row(s) skipped:\n{lines}" + (f"\n...and {more} more" if more else "")
+            QMessageBox.warning(self, "Import Finished", message)
+        else:
+            QMessageBox.information(self, "Import Finished", message)
+
+    def on_import_failed(self, message):
+        self.import_worker = None
+        QMessageBox.critical(self, "Import Failed", message)
+
+    def make_date_edit(self, date):
+        date_edit = QDateEdit()
+        date_edit.setCalendarPopup(True)
+        date_edit.setDisplayFormat("yyyy-MM-dd")
+        date_edit.setMinimumHeight(40)
+        date_edit.setDate(date)
+        return date_edit
+
+    def open_duplicate_plan_dialog(self):
+        plan = get_plan(self.selected_plan_id) if self.selected_plan_id else None
+        if not plan:
+            return
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Duplicate Plan")
+        dialog.setMinimumSize(450, 300)
+        layout = QVBoxLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        title = QLabel(f"Duplicate \"{plan[1]}\"")
+        title.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
+        layout.addWidget(title)
+
+        name_entry = QLineEdit(plan[1])
+        name_entry.setMinimumHeight(30)
+        layout.addWidget(name_entry)
+        date_edit = self.make_date_edit(QDate.fromString(plan[2], "yyyy-MM-dd").addDays(7))
+        layout.addWidget(date_edit)
+
+        def submit():
+            name = name_entry.text().strip()
+            if not name:
+                QMessageBox.critical(dialog, "Error", "Plan name cannot be empty.")
+                return
+            write_behind(clone_plan, plan[0], name, date_edit.date().toString("yyyy-MM-dd"),
+                         callback=self.open_cloned_plan)
+            dialog.accept()
+
+        submit_button = AnimatedButton("Duplicate", button_type="primary")
+        submit_button.clicked.connect(submit)
+        layout.addWidget(submit_button)
+        dialog.exec()
+        dialog.deleteLater()
+
+    def open_cloned_plan(self, plan_id):
+        if plan_id and self.current_screen == "plans":
+            self.open_plan(plan_id)
+
+    def open_repeat_plans_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Repeat Plans")
+        dialog.setMinimumSize(500, 420)
+        layout = QVBoxLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        title = QLabel("Repeat Plans as a Template")
+        title.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
+        layout.addWidget(title)
+
+        today = QDate.currentDate()
+        week_start = today.addDays(1 - today.dayOfWeek())
+        fields = [
+            ("Template from", week_start),
+            ("Template to", week_start.addDays(6)),
+            ("Repeat from", week_start.addDays(7)),
+            ("Repeat until", week_start.addDays(7 * 12 + 6))
+        ]
+        grid = QGridLayout()
+        date_edits = []
+        for row, (label_text, date) in enumerate(fields):
+            label = QLabel(label_text)
+            date_edit = self.make_date_edit(date)
+            grid.addWidget(label, row, 0)
+            grid.addWidget(date_edit, row, 1)
+            date_edits.append(date_edit)
+        layout.addLayout(grid)
+
+        def submit():
+            dates = [date_edit.date().toString("yyyy-MM-dd") for date_edit in date_edits]
+            try:
+                write_behind(instantiate_template, self.user_id, *dates, callback=self.on_plans_repeated)
+            except ValueError as e:
+                QMessageBox.critical(dialog, "Error", str(e))
+                return
+            dialog.accept()
+
+        submit_button = AnimatedButton("Create Plans", button_type="primary")
+        submit_button.clicked.connect(submit)
+        layout.addWidget(submit_button)
+        dialog.exec()
+        dialog.deleteLater()
+
+    def on_plans_repeated(self, new_plan_ids):
+        if new_plan_ids:
+            QMessageBox.information(self, "Repeat Plans", f"Created {len(new_plan_ids)} plans.")
+        else:
+            QMessageBox.information(self, "Repeat Plans", "There are no plans in the template range.")
+
+    def export_meals_ui(self):
+        if self.export_worker is not None:
+            QMessageBox.information(self, "Export", "An export is already running.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Meals", "meals.csv",
+                                              "CSV (*.csv);;CSV, gzipped (*.csv.gz);;JSON Lines (*.jsonl);;"
+                                              "JSON Lines, gzipped (*.jsonl.gz);;NumPy archive (*.npz)")
+        if not path:
+            return
+        # A date range typed into the plan search box limits the export to those plans
+        date_range = plan_search_range(self.plan_search_entry.text())
+        date_from, date_to = (date_range[0], date_range[1].rstrip("~")) if date_range else (None, None)
+        self.export_worker = TaskWorker(export_meals, self.user_id, path, date_from, date_to)
+        self.export_worker.signals.result.connect(self.on_export_finished)
+        self.export_worker.signals.error.connect(self.on_export_failed)
+        self.export_worker.start()
+
+    def on_export_finished(self, report):
+        self.export_worker = None
+        QMessageBox.information(self, "Export Finished",
+                                f"Exported {report['rows']} meals ({report['bytes'] / 1024:.0f} KB) "
+                                f"in {report['seconds']:.1f}s.")
+
+    def on_export_failed(self, message):
+        self.export_worker = None
+        QMessageBox.critical(self, "Export Failed", message)
 
     def clear_meals(self):
+        self.meal_tabs = None
+        self.meal_tab_map = {}
+        self.meal_table = None
         for i in reversed(range(self.meals_layout.count())):
             item = self.meals_layout.itemAt(i)
             if item:
@@ -1315,90 +3839,101 @@ class MealPlannerApp(QMainWindow):
             add_button = AnimatedButton("Add Meal", button_type="primary")
             add_button.clicked.connect(self.open_meal_creator)
             button_bar_layout.addWidget(add_button)
+            view_button = AnimatedButton("Switch View", button_type="secondary")
+            view_button.clicked.connect(self.toggle_meal_view)
+            button_bar_layout.addWidget(view_button)
+            duplicate_button = AnimatedButton("Duplicate Plan", button_type="secondary")
+            duplicate_button.clicked.connect(self.open_duplicate_plan_dialog)
+            button_bar_layout.addWidget(duplicate_button)
             button_bar_layout.addStretch()  # Pushes button to the right
             self.meal_header_frame.layout().addWidget(button_bar)
 
     def render_plan_meals(self):
+        # Diffs the tabs against the plan by meal id, so only changed meals touch widgets
+        meals = get_meals_in_plan(self.selected_plan_id)
+        shown = self.meal_tabs if self.meal_tabs is not None else self.meal_table
+        if shown is not None and shown.property("plan_id") != self.selected_plan_id:
+            self.clear_meals()
+        if not meals:
+            self.show_no_meals()
+            return
+        mode = self.meal_view_mode or ("table" if len(meals) > MEAL_TABS_LIMIT else "tabs")
+        if mode == "table":
+            self.show_meal_table().model.set_meals(meals)
+            return
+        if self.meal_table is not None:
+            self.clear_meals()
+        current = {meal[0] for meal in meals}
+        for mid in [mid for mid in self.meal_tab_map if mid not in current]:
+            self.remove_meal_tab(mid)
+        for index, meal in enumerate(meals):
+            if meal[0] in self.meal_tab_map:
+                self.update_meal_tab(meal)
+            else:
+                self.add_meal_tab(meal, index)
+
+    def toggle_meal_view(self):
+        self.meal_view_mode = "tabs" if self.meal_table is not None else "table"
         self.clear_meals()
+        self.render_plan_meals()
 
-        meals = get_meals_in_plan(self.selected_plan_id)
-        if meals:
-            meal_tabs = QTabWidget()
-            meal_tabs.setStyleSheet(f"""
-                QTabWidget::pane {{
-                    background: {CARD_BG};
-                    border: none;
-                }}
-                QTabBar::tab {{
-                    background: {SECONDARY_BG};
-                    color: {TEXT_COLOR};
-                    border: 1px solid {BORDER_COLOR};
-                    border-radius: 6px;
-                    padding: 8px;
-                    margin-right: 2px;
-                }}
-                QTabBar::tab:selected {{
-                    background: {PRIMARY_COLOR};
-                    color: {TEXT_COLOR};
-                }}
-            """)
+    def show_meal_table(self):
+        if self.meal_table is not None:
+            return self.meal_table
+        self.clear_meals()
+        self.meal_table = MealTableView()
+        self.meal_table.setProperty("plan_id", self.selected_plan_id)
+        self.meal_table.actions.edit_requested.connect(self.open_meal_editor)
+        self.meal_table.actions.delete_requested.connect(self.remove_meal)
+        self.meals_layout.addWidget(self.meal_table)
+        return self.meal_table
+
+    def show_meal_tabs(self):
+        if self.meal_tabs is not None:
+            return self.meal_tabs
+        self.clear_meals()
+        self.meal_tabs = QTabWidget()
+        self.meal_tabs.setProperty("plan_id", self.selected_plan_id)
+        self.meal_tabs.setObjectName("mealTabs")
+        self.meals_layout.addWidget(self.meal_tabs)
+        return self.meal_tabs
 
-            for meal in meals:
-                mid, mname, mtype, cal, pro, carb, fat, prep, cat = meal
-                tab_content = QWidget()
-                tab_layout = QVBoxLayout(tab_content)
-                tab_layout.setContentsMargins(10, 10, 10, 10)
-                tab_layout.setSpacing(5)
-
-                details_layout = QGridLayout()
-                details_layout.setSpacing(5)
-                details = [
-                    ("Type", mtype, TEXT_COLOR),
-                    ("Calories", f"{cal:.1f} kcal", ACCENT_COLOR),
-                    ("Protein", f"{pro:.1f} g", SUCCESS_COLOR),
-                    ("Carbs", f"{carb:.1f} g", CHART_COLORS[2]),
-                    ("Fats", f"{fat:.1f} g", CHART_COLORS[3]),
-                    ("Prep Time", f"{prep} min", TEXT_COLOR),
-                    ("Category", cat, TEXT_COLOR)
-                ]
-                for idx, (label, value, color) in enumerate(details):
-                    lbl = QLabel(label)
-                    lbl.setStyleSheet(f"color: {TEXT_COLOR}; font-weight: bold;")
-                    val = QLabel(value)
-                    val.setStyleSheet(f"color: {color};")
-                    details_layout.addWidget(lbl, idx, 0)
-                    details_layout.addWidget(val, idx, 1)
-                tab_layout.addLayout(details_layout)
-
-                actions_layout = QHBoxLayout()
-                edit_button = AnimatedButton("Edit", button_type="success")
-                edit_button.clicked.connect(lambda checked, m=meal: self.open_meal_editor(m))
-                delete_button = AnimatedButton("Delete", button_type="danger")
-                delete_button.clicked.connect(lambda checked, m=mid: self.remove_meal(m))
-                actions_layout.addWidget(edit_button)
-                actions_layout.addWidget(delete_button)
-                tab_layout.addLayout(actions_layout)
-
-                tab_content.setLayout(tab_layout)
-                meal_tabs.addTab(tab_content, mname)
-
-            self.meals_layout.addWidget(meal_tabs)
-        else:
-            no_meals = QLabel("No meals added yet. Click 'Add Meal' to get started!")
-            no_meals.setFont(QFont("Roboto", 16))
-            no_meals.setStyleSheet(f"color: {TEXT_COLOR}; opacity: 0.8;")
-            no_meals.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.meals_layout.addWidget(no_meals)
+    def show_no_meals(self):
+        self.clear_meals()
+        no_meals = QLabel("No meals added yet. Click 'Add Meal' to get started!")
+        no_meals.setFont(QFont("Roboto", 16))
+        no_meals.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.meals_layout.addWidget(no_meals)
+
+    def add_meal_tab(self, meal, index=-1):
+        meal_tabs = self.show_meal_tabs()
+        tab = MealTab(meal)
+        tab.edit_requested.connect(self.open_meal_editor)
+        tab.delete_requested.connect(self.remove_meal)
+        meal_tabs.insertTab(index, tab, meal[1])
+        self.meal_tab_map[meal[0]] = tab
+
+    def update_meal_tab(self, meal):
+        tab = self.meal_tab_map.get(meal[0])
+        if tab and tab.set_meal(meal):
+            self.meal_tabs.setTabText(self.meal_tabs.indexOf(tab), meal[1])
+
+    def remove_meal_tab(self, meal_id):
+        tab = self.meal_tab_map.pop(meal_id, None)
+        if tab is None:
+            return
+        self.meal_tabs.removeTab(self.meal_tabs.indexOf(tab))
+        tab.deleteLater()
+        if not self.meal_tab_map:
+            self.show_no_meals()
 
     def open_meal_creator(self):
         dialog = MealCreatorDialog(self, plan_id=self.selected_plan_id, user_id=self.user_id)
-        if dialog.exec():
-            self.render_plan_meals()
+        dialog.exec()
 
     def open_meal_editor(self, meal_data):
         dialog = MealCreatorDialog(self, meal_data=meal_data, plan_id=self.selected_plan_id, user_id=self.user_id)
-        if dialog.exec():
-            self.render_plan_meals()
+        dialog.exec()
 
     def display_mini_dashboard(self, dashboard_layout):
         try:
@@ -1407,7 +3942,8 @@ class MealPlannerApp(QMainWindow):
                 return
 
             # Macronutrient Pie Chart
-            fig1, ax1 = plt.subplots(figsize=(5, 4))
+            fig1 = new_figure((5, 4))
+            ax1 = fig1.subplots()
             macros = {'Protein': 0, 'Carbs': 0, 'Fats': 0}
             for meal in meals:
                 _, _, _, _, pro, carb, fat, _, _ = meal
@@ -1424,24 +3960,19 @@ class MealPlannerApp(QMainWindow):
                 ax1.axis('equal')
                 fig1.patch.set_facecolor(CARD_BG)
                 macro_frame = QFrame()
-                macro_frame.setStyleSheet(f"""
-                    background: {SECONDARY_BG};
-                    border-radius: 8px;
-                    border: 1px solid {BORDER_COLOR};
-                    padding: 10px;
-                """)
+                macro_frame.setProperty("frameRole", "panel")
                 macro_layout = QVBoxLayout(macro_frame)
                 title_label = QLabel("Macros")
                 title_label.setFont(QFont("Roboto", 12, QFont.Weight.Bold))
-                title_label.setStyleSheet(f"color: {TEXT_COLOR};")
                 macro_layout.addWidget(title_label)
-                canvas1 = FigureCanvas(fig1, {}, 'pie', self)
+                canvas1 = make_chart_canvas(fig1, {}, 'pie', self)
                 canvas1.enlarged.connect(self.enlarge_visualization)
                 macro_layout.addWidget(canvas1)
                 dashboard_layout.addWidget(macro_frame)
 
             # Calories Bar Chart
-            fig2, ax2 = plt.subplots(figsize=(5, 4))
+            fig2 = new_figure((5, 4))
+            ax2 = fig2.subplots()
             meal_types = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
             calories = {t: 0 for t in meal_types}
             counts = {t: 0 for t in meal_types}
@@ -1459,24 +3990,19 @@ class MealPlannerApp(QMainWindow):
                 ax2.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
                 fig2.patch.set_facecolor(CARD_BG)
                 bar_frame = QFrame()
-                bar_frame.setStyleSheet(f"""
-                    background: {SECONDARY_BG};
-                    border-radius: 8px;
-                    border: 1px solid {BORDER_COLOR};
-                    padding: 10px;
-                """)
+                bar_frame.setProperty("frameRole", "panel")
                 bar_layout = QVBoxLayout(bar_frame)
                 title_label = QLabel("Calories")
                 title_label.setFont(QFont("Roboto", 12, QFont.Weight.Bold))
-                title_label.setStyleSheet(f"color: {TEXT_COLOR};")
                 bar_layout.addWidget(title_label)
-                canvas2 = FigureCanvas(fig2, {}, 'bar', self)
+                canvas2 = make_chart_canvas(fig2, {}, 'bar', self)
                 canvas2.enlarged.connect(self.enlarge_visualization)
                 bar_layout.addWidget(canvas2)
                 dashboard_layout.addWidget(bar_frame)
 
             # Prep Time Bar Chart
-            fig3, ax3 = plt.subplots(figsize=(5, 4))
+            fig3 = new_figure((5, 4))
+            ax3 = fig3.subplots()
             prep_times = {t: 0 for t in meal_types}
             prep_counts = {t: 0 for t in meal_types}
             for meal in meals:
@@ -1493,18 +4019,12 @@ class MealPlannerApp(QMainWindow):
                 ax3.grid(True, linestyle='--', alpha=0.3, color=BORDER_COLOR)
                 fig3.patch.set_facecolor(CARD_BG)
                 prep_frame = QFrame()
-                prep_frame.setStyleSheet(f"""
-                    background: {SECONDARY_BG};
-                    border-radius: 8px;
-                    border: 1px solid {BORDER_COLOR};
-                    padding: 10px;
-                """)
+                prep_frame.setProperty("frameRole", "panel")
                 prep_layout = QVBoxLayout(prep_frame)
                 title_label = QLabel("Prep Time")
                 title_label.setFont(QFont("Roboto", 12, QFont.Weight.Bold))
-                title_label.setStyleSheet(f"color: {TEXT_COLOR};")
                 prep_layout.addWidget(title_label)
-                canvas3 = FigureCanvas(fig3, {}, 'bar', self)
+                canvas3 = make_chart_canvas(fig3, {}, 'bar', self)
                 canvas3.enlarged.connect(self.enlarge_visualization)
                 prep_layout.addWidget(canvas3)
                 dashboard_layout.addWidget(prep_frame)
@@ -1521,66 +4041,48 @@ class MealPlannerApp(QMainWindow):
             if QMessageBox.question(self, "Confirm", 
                                   f"Are you sure you want to delete the meal '{meal_name[0]}'? This action cannot be undone.",
                                   QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
-                delete_meal(meal_id)
-                self.render_plan_meals()
-                QMessageBox.information(self, "Success", "Meal deleted successfully.")
+                write_behind(delete_meal, meal_id, callback=self.on_meal_removed)
+
+    def on_meal_removed(self, result):
+        QMessageBox.information(self, "Success", "Meal deleted successfully.")
 
     def open_settings(self):
-        self.build_settings_ui()
+        self.show_screen("settings")
 
     def open_change_password_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Change Password")
         dialog.setMinimumSize(500, 400)
-        dialog.setStyleSheet(f"background: {PRIMARY_BG};")
         layout = QVBoxLayout(dialog)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
         title = QLabel("Change Password")
         title.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR};")
         layout.addWidget(title)
 
         current_password = QLineEdit()
         current_password.setPlaceholderText("Current Password")
         current_password.setEchoMode(QLineEdit.EchoMode.Password)
         current_password.setMinimumHeight(30)
-        current_password.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         layout.addWidget(current_password)
 
         new_password = QLineEdit()
         new_password.setPlaceholderText("New Password")
         new_password.setEchoMode(QLineEdit.EchoMode.Password)
         new_password.setMinimumHeight(30)
-        new_password.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         layout.addWidget(new_password)
 
         confirm_password = QLineEdit()
         confirm_password.setPlaceholderText("Confirm New Password")
         confirm_password.setEchoMode(QLineEdit.EchoMode.Password)
         confirm_password.setMinimumHeight(30)
-        confirm_password.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         layout.addWidget(confirm_password)
 
+        status_label = QLabel()
+        status_label.setProperty("accent", "accent")
+        layout.addWidget(status_label)
+
         button_layout = QHBoxLayout()
         cancel_button = AnimatedButton("Cancel", button_type="secondary")
         cancel_button.clicked.connect(dialog.reject)
@@ -1593,18 +4095,19 @@ class MealPlannerApp(QMainWindow):
             if not all([current_password.text(), new_password.text(), confirm_password.text()]):
                 QMessageBox.critical(dialog, "Error", "All fields are required.")
                 return
-            user = login_user(self.username, current_password.text())
-            if not user:
-                QMessageBox.critical(dialog, "Error", "Current password is incorrect.")
-                return
             if new_password.text() != confirm_password.text():
                 QMessageBox.critical(dialog, "Error", "New passwords do not match.")
                 return
-            with get_connection() as conn:
-                conn.execute("UPDATE users SET password=? WHERE id=?", (new_password.text(), self.user_id))
-                conn.commit()
-            QMessageBox.information(dialog, "Success", "Password updated successfully.")
-            dialog.accept()
+            def changed(ok):
+                if ok:
+                    QMessageBox.information(dialog, "Success", "Password updated successfully.")
+                    dialog.accept()
+                else:
+                    QMessageBox.critical(dialog, "Error", "Current password is incorrect.")
+
+            self.run_credential_task([current_password, new_password, confirm_password, submit_button, cancel_button],
+                                     status_label, "Updating password...", change_password, self.username,
+                                     current_password.text(), new_password.text(), callback=changed)
 
         submit_button.clicked.connect(submit)
         dialog.exec()
@@ -1613,41 +4116,29 @@ class MealPlannerApp(QMainWindow):
         dialog = QDialog(self)
         dialog.setWindowTitle("Update Username")
         dialog.setMinimumSize(500, 350)
-        dialog.setStyleSheet(f"background: {PRIMARY_BG};")
         layout = QVBoxLayout(dialog)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
         title = QLabel("Update Username")
         title.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR};")
         layout.addWidget(title)
 
         new_username = QLineEdit()
         new_username.setPlaceholderText("New Username")
         new_username.setMinimumHeight(30)
-        new_username.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         layout.addWidget(new_username)
 
         password = QLineEdit()
         password.setPlaceholderText("Current Password")
         password.setEchoMode(QLineEdit.EchoMode.Password)
         password.setMinimumHeight(30)
-        password.setStyleSheet(f"""
-            background-color: {SECONDARY_BG};
-            border: 1px solid {BORDER_COLOR};
-            border-radius: 6px;
-            padding: 10px;
-            color: {TEXT_COLOR};
-        """)
         layout.addWidget(password)
 
+        status_label = QLabel()
+        status_label.setProperty("accent", "accent")
+        layout.addWidget(status_label)
+
         button_layout = QHBoxLayout()
         cancel_button = AnimatedButton("Cancel", button_type="secondary")
         cancel_button.clicked.connect(dialog.reject)
@@ -1660,17 +4151,24 @@ class MealPlannerApp(QMainWindow):
             if not all([new_username.text(), password.text()]):
                 QMessageBox.critical(dialog, "Error", "All fields are required.")
                 return
-            user = login_user(self.username, password.text())
-            if not user:
-                QMessageBox.critical(dialog, "Error", "Password is incorrect.")
-                return
-            if update_username(self.user_id, new_username.text()):
-                self.username = new_username.text()
-                QMessageBox.information(dialog, "Success", "Username updated successfully.")
-                dialog.accept()
-                self.build_settings_ui()  # Refresh settings page with new username
-            else:
-                QMessageBox.critical(dialog, "Error", "Username already exists.")
+            def verified(user):
+                if user:
+                    write_behind(update_username, self.user_id, new_username.text(), callback=updated)
+                else:
+                    QMessageBox.critical(dialog, "Error", "Password is incorrect.")
+
+            def updated(ok):
+                if ok:
+                    self.username = new_username.text()
+                    QMessageBox.information(dialog, "Success", "Username updated successfully.")
+                    dialog.accept()
+                    self.page_revisions.pop("home", None)  # The welcome line shows the username
+                else:
+                    QMessageBox.critical(dialog, "Error", "Username already exists.")
+
+            self.run_credential_task([new_username, password, submit_button, cancel_button], status_label,
+                                     "Verifying password...", login_user, self.username, password.text(),
+                                     callback=verified)
 
         submit_button.clicked.connect(submit)
         dialog.exec()
@@ -1680,36 +4178,29 @@ class MealPlannerApp(QMainWindow):
         dialog = QDialog(self)
         dialog.setWindowTitle("Account Information")
         dialog.setMinimumSize(500, 400)
-        dialog.setStyleSheet(f"background: {PRIMARY_BG};")
         layout = QVBoxLayout(dialog)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
         title = QLabel("Account Information")
         title.setFont(QFont("Roboto", 18, QFont.Weight.Bold))
-        title.setStyleSheet(f"color: {TEXT_COLOR};")
         layout.addWidget(title)
 
         info_frame = QFrame()
-        info_frame.setStyleSheet(f"""
-            background: {CARD_BG};
-            border-radius: 12px;
-            border: 1px solid {BORDER_COLOR};
-            padding: 15px;
-        """)
+        info_frame.setProperty("frameRole", "section")
         info_layout = QVBoxLayout(info_frame)
         info_layout.setSpacing(10)
 
         info_data = [
-            (f"Username: {self.username}", TEXT_COLOR),
-            (f"Total Meal Plans: {plan_count}", PRIMARY_COLOR),
-            (f"Total Meals: {meal_count}", SUCCESS_COLOR)
+            (f"Username: {self.username}", None),
+            (f"Total Meal Plans: {plan_count}", "primary"),
+            (f"Total Meals: {meal_count}", "success")
         ]
 
-        for text, color in info_data:
+        for text, accent in info_data:
             label = QLabel(text)
             label.setFont(QFont("Roboto", 14))
-            label.setStyleSheet(f"color: {color};")
+            label.setProperty("accent", accent)
             info_layout.addWidget(label)
 
         layout.addWidget(info_frame)
@@ -1724,12 +4215,62 @@ class MealPlannerApp(QMainWindow):
         if QMessageBox.question(self, "Confirm",
                               "Are you sure you want to delete ALL meal plans and meals? This action cannot be undone.",
                               QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
-            delete_all_plans(self.user_id)
-            self.build_settings_ui()  # Refresh the settings page after clearing the meal plans
-            QMessageBox.information(self, "Success", "All meal plans and meals deleted successfully.")
+            write_behind(delete_all_plans, self.user_id, callback=self.on_plans_deleted)
+
+    def on_plans_deleted(self, result):
+        QMessageBox.information(self, "Success", "All meal plans and meals deleted successfully.")
+
+class FirstPaintWatcher(QObject):
+    painted = pyqtSignal()
+
+    def __init__(self, widget):
+        super().__init__(widget)
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self.painted.emit)  # Once this paint has reached the screen
+        return False
+
+def print_startup_profile(budget_ms=None):
+    print("Startup profile (ms since healthyt.py started running):", file=sys.stderr)
+    previous = STARTUP_STARTED
+    for label, at in STARTUP_MARKS:
+        print(f"  {(at - STARTUP_STARTED) * 1000:8.1f}  (+{(at - previous) * 1000:6.1f})  {label}", file=sys.stderr)
+        previous = at
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"Heavy modules loaded before first paint: {', '.join(loaded) or 'none'}", file=sys.stderr)
+    total_ms = (STARTUP_MARKS[-1][1] - STARTUP_STARTED) * 1000
+    if budget_ms is not None and total_ms > budget_ms:
+        print(f"Over the {budget_ms:.0f} ms startup budget by {total_ms - budget_ms:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+def parse_gui_args(argv):
+    parser = argparse.ArgumentParser(prog="healthyt.py", add_help=False)
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print startup timings once the login window has painted, then exit")
+    parser.add_argument("--startup-budget", type=float, metavar="MS",
+                        help="with --startup-profile, exit with status 1 when first paint takes longer")
+    parser.add_argument("--no-prewarm", action="store_true", help="don't load the chart modules ahead of time")
+    return parser.parse_known_args(argv)[0]  # The rest is left to Qt
+
+def on_first_paint(app, args):
+    startup_mark("first paint")
+    if args.startup_profile:
+        app.exit(print_startup_profile(args.startup_budget))
+    elif PREWARM_IMPORTS and not args.no_prewarm:
+        threading.Thread(target=prewarm_imports, name="prewarm", daemon=True).start()
 
 if __name__ == "__main__":
+    args = parse_gui_args(sys.argv[1:])
+    startup_mark("module loaded")
     app = QApplication(sys.argv)
+    startup_mark("QApplication created")
     window = MealPlannerApp()
+    startup_mark("login window built")
+    first_paint = FirstPaintWatcher(window)
+    first_paint.painted.connect(functools.partial(on_first_paint, app, args))
     window.show()
     sys.exit(app.exec())
\ No newline at end of file